@@ -1,13 +1,28 @@
+import asyncio
+import contextvars
+import csv
+import hashlib
+import io
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import numpy as np
 import pandas as pd
 import joblib
-from fastapi import FastAPI, HTTPException, Body, Query
+from fastapi import FastAPI, HTTPException, Body, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
-from typing import List, Dict, Optional
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, validator
+from typing import Any, List, Dict, Optional
 import uvicorn
 
+from metrics import MetricsMiddleware, MetricsRegistry, request_labels
+from model.forest_engine import FlatForest, save_array
+
 # Create FastAPI app
 app = FastAPI(
     title="Budget Forecast API",
@@ -24,22 +39,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load the trained models
-MODEL_DIR = "//home/jophin/Desktop/project/Paisawise/model"
-revenue_model = joblib.load(os.path.join(MODEL_DIR, "revenue_model.joblib"))
-expenditure_model = joblib.load(os.path.join(MODEL_DIR, "expenditure_model.joblib"))
+# Per-stage latency, request and error metrics served at /metrics (disable with METRICS_ENABLED=0)
+metrics = MetricsRegistry(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
+metrics.describe("forecast_stage_duration_seconds", "histogram", "Time spent in each forecast stage")
+metrics.describe("http_request_duration_seconds", "histogram", "End-to-end request latency")
+metrics.describe("http_requests_total", "counter", "Requests handled")
+metrics.describe("http_request_errors_total", "counter", "Requests answered with a 4xx or 5xx status")
+metrics.describe("forecast_batch_item_errors_total", "counter", "Batch items that could not be forecast")
+
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# Directory with the trained model artifacts written by model/develop_models.py
+MODEL_DIR = os.environ.get("MODEL_DIR", "//home/jophin/Desktop/project/Paisawise/model")
+
+# SHARED_MODELS=1 serves the memory-mappable export in MODEL_DIR/shared (see `python app.py --export-shared`),
+# so worker processes share one copy of the model arrays through the page cache
+SHARED_MODELS = os.environ.get("SHARED_MODELS", "0") == "1"
 
-# Load Random Forest models if available
-RF_MODEL_DIR = os.path.join(MODEL_DIR, "random_forest")
-rf_revenue_model = None
-rf_expenditure_model = None
+# RF_ARTIFACT=compact serves the compressed float32 forests that model/develop_models.py writes next
+# to the full ones (*_compact.npz) straight into the flattened engine, without unpickling sklearn
+RF_ARTIFACT = os.environ.get("RF_ARTIFACT", "full")
 
-if os.path.exists(os.path.join(RF_MODEL_DIR, "revenue_model_rf.joblib")):
-    rf_revenue_model = joblib.load(os.path.join(RF_MODEL_DIR, "revenue_model_rf.joblib"))
-    rf_expenditure_model = joblib.load(os.path.join(RF_MODEL_DIR, "expenditure_model_rf.joblib"))
+def shared_model_dir(model_dir):
+    return os.path.join(model_dir, "shared")
+
+def model_artifact_paths(model_dir, shared=False):
+    """Paths of every artifact that makes up one model set"""
+    if shared:
+        # The manifest is written last, so it changes once per complete export
+        return {"manifest": os.path.join(shared_model_dir(model_dir), "manifest.json")}
+    
+    rf_model_dir = os.path.join(model_dir, "random_forest")
+    forest_extension = "_compact.npz" if RF_ARTIFACT == "compact" else ".joblib"
+    return {
+        "revenue": os.path.join(model_dir, "revenue_model.joblib"),
+        "expenditure": os.path.join(model_dir, "expenditure_model.joblib"),
+        "rf_revenue": os.path.join(rf_model_dir, "revenue_model_rf" + forest_extension),
+        "rf_expenditure": os.path.join(rf_model_dir, "expenditure_model_rf" + forest_extension),
+        "rf_multi": os.path.join(model_dir, "multi_output", "forecast_model_multi" + forest_extension),
+        "scaler": os.path.join(model_dir, "feature_scaler.joblib"),
+    }
 
-# Load the feature scaler
-scaler = joblib.load(os.path.join(MODEL_DIR, "feature_scaler.joblib"))
+def artifact_fingerprint(paths):
+    """Identify a set of model artifacts by path, size and modification time"""
+    fingerprint = []
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
 
 # Define input data model
 class QuarterData(BaseModel):
@@ -66,107 +115,1195 @@ class ForecastResponse(BaseModel):
     next_quarter_gross_profit: float
     confidence_score: float
 
+class BatchForecastRequest(BaseModel):
+    # Items are validated one by one so a bad company doesn't reject the whole batch
+    companies: List[Any] = Field(..., min_items=1, description="Forecast requests, one per company")
+
+class BatchForecastItem(BaseModel):
+    index: int
+    forecast: Optional[ForecastResponse] = None
+    error: Optional[str] = None
+
+class BatchForecastResponse(BaseModel):
+    model_type: str
+    succeeded: int
+    failed: int
+    results: List[BatchForecastItem]
+
+# Feature layout expected by the scaler and models (most recent quarter first)
+FEATURE_METRICS = ['Revenue', 'Expenditure', 'Gross_Profit', 'Total_Income']
+FEATURE_NAMES = [f"{metric}_Lag{lag}" for lag in range(1, 5) for metric in FEATURE_METRICS]
+
+# Confidence scores based on model evaluation
+CONFIDENCE_SCORES = {
+    "default": 0.89,
+    "random_forest": 0.88,
+    "multi_output": 0.88
+}
+
+# Model types served by forests rather than the default linear models
+FOREST_MODEL_TYPES = ("random_forest", "multi_output")
+
+def compute_scale_factors(avg_revenue):
+    """Get the factor that scales each company's figures up to the millions range"""
+    avg_revenue = np.asarray(avg_revenue, dtype=float)
+    scale_factor = np.ones_like(avg_revenue)
+    
+    # If average revenue is less than 1 million, apply scaling (roughly to millions)
+    small = avg_revenue < 1000000
+    magnitude = np.trunc(np.log10(avg_revenue[small]))
+    scale_factor[small] = 10.0 ** (6 - magnitude)
+    
+    return scale_factor
+
+def build_feature_matrix(requests):
+    """Build the lag feature matrix for a list of forecast requests"""
+    # Shape: (companies, quarters, [revenue, expenditure, gross_profit])
+    history = np.array(
+        [[[q.revenue, q.expenditure, q.gross_profit] for q in r.past_quarters] for r in requests],
+        dtype=float
+    ).reshape(len(requests), 4, 3)
+    
+    return build_features_from_history(history)
+
+def build_features_from_history(history):
+    """Build the lag feature matrix from a (companies, 4, [revenue, expenditure, gross_profit]) array"""
+    avg_revenue = history[:, :, 0].mean(axis=1)
+    avg_expenditure = history[:, :, 1].mean(axis=1)
+    scale_factor = compute_scale_factors(avg_revenue)
+    
+    # Add features in reverse order (most recent first), applying scaling if needed
+    scaled = history[:, ::-1, :] * scale_factor[:, None, None]
+    total_income = scaled[:, :, 0] + scaled[:, :, 2]  # Total income approximation
+    features = np.concatenate([scaled, total_income[:, :, None]], axis=2).reshape(len(history), -1)
+    
+    return features, avg_revenue, avg_expenditure, scale_factor
+
+def predict_features_sklearn(features, model_type, models):
+    """Scale a feature matrix and predict revenue and expenditure with one call per target"""
+    with metrics.stage("dataframe"):
+        features_df = pd.DataFrame(features, columns=FEATURE_NAMES)
+    with metrics.stage("scale"):
+        scaled_features = models.scaler.transform(features_df)
+    
+    with metrics.stage("predict"):
+        if model_type == "random_forest" and models.rf_revenue_model is not None:
+            return models.rf_revenue_model.predict(scaled_features), models.rf_expenditure_model.predict(scaled_features)
+        
+        if model_type == "multi_output" and models.multi_output_model is not None:
+            predictions = models.multi_output_model.predict(scaled_features)
+            return predictions[:, 0], predictions[:, 1]
+        
+        return models.revenue_model.predict(scaled_features), models.expenditure_model.predict(scaled_features)
+
+def fold_linear_models(scaler, models):
+    """Fold the scaler's mean/scale into the linear models' weights
+
+    Returns a (features, targets) weight matrix and an intercept vector so that
+    raw_features @ weights + intercepts equals model.predict(scaler.transform(raw_features)),
+    or None if the scaler or any model is not linear.
+    """
+    if not all(hasattr(model, 'coef_') and hasattr(model, 'intercept_') for model in models):
+        return None
+    if not hasattr(scaler, 'scale_') or not hasattr(scaler, 'mean_'):
+        return None
+    
+    n_features = len(FEATURE_NAMES)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+    
+    coefs = np.column_stack([np.ravel(model.coef_) for model in models])
+    if coefs.shape[0] != n_features:
+        return None
+    
+    weights = coefs / np.asarray(scale, dtype=float)[:, None]
+    intercepts = np.array([float(np.ravel(model.intercept_)[0]) for model in models]) - mean @ weights
+    
+    return weights, intercepts
+
+def check_linear_parity(models, weights, intercepts, n_rows=64, rtol=1e-6):
+    """Compare the folded linear weights against the sklearn path on synthetic rows"""
+    rng = np.random.default_rng(0)
+    mean = models.scaler.mean_ if models.scaler.mean_ is not None else np.zeros(len(FEATURE_NAMES))
+    scale = models.scaler.scale_ if models.scaler.scale_ is not None else np.ones(len(FEATURE_NAMES))
+    probe = mean + rng.standard_normal((n_rows, len(FEATURE_NAMES))) * scale
+    
+    expected = np.column_stack(predict_features_sklearn(probe, "default", models))
+    folded = probe @ weights + intercepts
+    
+    # Tolerance relative to the size of the predictions so large revenues don't fail on rounding
+    tolerance = rtol * max(1.0, float(np.abs(expected).max()))
+    return bool(np.abs(folded - expected).max() <= tolerance)
+
+def scale_features(features, scaler):
+    """Apply the feature scaler to a raw feature matrix without the DataFrame round trip"""
+    if getattr(scaler, 'mean_', None) is not None and getattr(scaler, 'scale_', None) is not None:
+        return (features - scaler.mean_) / scaler.scale_
+    return scaler.transform(pd.DataFrame(features, columns=FEATURE_NAMES))
+
+def check_forest_parity(forest, engine, n_rows=64, rtol=1e-9):
+    """Compare a flattened forest against sklearn's predict on synthetic scaled rows"""
+    rng = np.random.default_rng(0)
+    probe = rng.standard_normal((n_rows, len(FEATURE_NAMES)))
+    
+    expected = forest.predict(probe)
+    tolerance = rtol * max(1.0, float(np.abs(expected).max()))
+    return bool(np.abs(engine.predict(probe) - expected).max() <= tolerance)
+
+# Fast paths: the default linear models are served with a single matmul (FAST_LINEAR_INFERENCE=0
+# disables it), and Random Forest batches of up to FOREST_ENGINE_MAX_ROWS rows from flattened tree
+# arrays (FAST_FOREST_INFERENCE=0 disables it); sklearn's compiled traversal wins on larger batches
+FAST_LINEAR_INFERENCE = os.environ.get("FAST_LINEAR_INFERENCE", "1") != "0"
+FAST_FOREST_INFERENCE = os.environ.get("FAST_FOREST_INFERENCE", "1") != "0"
+FOREST_ENGINE_MAX_ROWS = int(os.environ.get("FOREST_ENGINE_MAX_ROWS", "1024"))
+
+class SharedScaler:
+    """Mean and scale of the exported feature scaler; enough for scale_features without sklearn"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+class ModelSet:
+    """One loaded set of model artifacts plus the fast inference paths derived from it"""
+
+    def __init__(self, model_dir, fingerprint, revenue_model, expenditure_model, scaler,
+                 rf_revenue_model=None, rf_expenditure_model=None, multi_output_model=None):
+        self.model_dir = model_dir
+        self.fingerprint = fingerprint
+        self.revenue_model = revenue_model
+        self.expenditure_model = expenditure_model
+        self.scaler = scaler
+        self.rf_revenue_model = rf_revenue_model
+        self.rf_expenditure_model = rf_expenditure_model
+        self.multi_output_model = multi_output_model
+        self.linear_weights = None
+        self.linear_intercepts = None
+        self.rf_revenue_engine = None
+        self.rf_expenditure_engine = None
+        self.multi_output_engine = None
+        self.shared = False
+        self.loaded_at = time.time()
+        
+        # Version: newest artifact timestamp plus a short hash of the whole fingerprint
+        newest = max((mtime for _, _, mtime in fingerprint), default=0)
+        digest = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:8]
+        self.version = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(newest / 1e9))}-{digest}"
+
+    @classmethod
+    def load(cls, model_dir, shared=None):
+        """Load every artifact in model_dir, build the fast paths and warm them up"""
+        if SHARED_MODELS if shared is None else shared:
+            return cls.load_shared(model_dir)
+        
+        paths = model_artifact_paths(model_dir)
+        fingerprint = artifact_fingerprint(paths.values())
+        
+        if RF_ARTIFACT == "compact":
+            return cls.load_compact(model_dir, paths, fingerprint)
+        
+        rf_revenue_model = None
+        rf_expenditure_model = None
+        if os.path.exists(paths["rf_revenue"]):
+            rf_revenue_model = joblib.load(paths["rf_revenue"])
+            rf_expenditure_model = joblib.load(paths["rf_expenditure"])
+        
+        multi_output_model = None
+        if os.path.exists(paths["rf_multi"]):
+            multi_output_model = joblib.load(paths["rf_multi"])
+        
+        models = cls(
+            model_dir=model_dir,
+            fingerprint=fingerprint,
+            revenue_model=joblib.load(paths["revenue"]),
+            expenditure_model=joblib.load(paths["expenditure"]),
+            scaler=joblib.load(paths["scaler"]),
+            rf_revenue_model=rf_revenue_model,
+            rf_expenditure_model=rf_expenditure_model,
+            multi_output_model=multi_output_model
+        )
+        models.prepare_fast_paths()
+        models.warm_up()
+        return models
+
+    @classmethod
+    def load_compact(cls, model_dir, paths, fingerprint):
+        """Load the default models with sklearn and the forests from their compact arrays
+
+        The compact forests only exist as flattened engines, so every forest request,
+        whatever its size, goes through FlatForest.
+        """
+        models = cls(
+            model_dir=model_dir,
+            fingerprint=fingerprint,
+            revenue_model=joblib.load(paths["revenue"]),
+            expenditure_model=joblib.load(paths["expenditure"]),
+            scaler=joblib.load(paths["scaler"])
+        )
+        models.prepare_fast_paths()
+        
+        if os.path.exists(paths["rf_revenue"]):
+            models.rf_revenue_engine = FlatForest.load_compressed(paths["rf_revenue"])
+            models.rf_expenditure_engine = FlatForest.load_compressed(paths["rf_expenditure"])
+        if os.path.exists(paths["rf_multi"]):
+            models.multi_output_engine = FlatForest.load_compressed(paths["rf_multi"])
+        
+        models.warm_up()
+        return models
+
+    @classmethod
+    def load_shared(cls, model_dir):
+        """Memory-map the arrays written by export_shared instead of unpickling the models
+
+        Every process mapping the same files shares their pages, and sklearn is never
+        imported. Parity with the sklearn models was checked when the export was written.
+        """
+        directory = shared_model_dir(model_dir)
+        fingerprint = artifact_fingerprint(model_artifact_paths(model_dir, shared=True).values())
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        
+        source_fingerprint = artifact_fingerprint(model_artifact_paths(model_dir).values())
+        if [list(entry) for entry in source_fingerprint] != manifest["source_fingerprint"]:
+            print("Warning: the shared model export is older than the trained models, re-run `python app.py --export-shared`")
+        
+        def load_array(name):
+            return np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        
+        models = cls(
+            model_dir=model_dir,
+            fingerprint=fingerprint,
+            revenue_model=None,
+            expenditure_model=None,
+            scaler=SharedScaler(load_array("scaler_mean"), load_array("scaler_scale"))
+        )
+        models.shared = True
+        models.linear_weights = load_array("linear_weights")
+        models.linear_intercepts = load_array("linear_intercepts")
+        
+        forests = manifest["forests"]
+        if "rf_revenue" in forests:
+            models.rf_revenue_engine = FlatForest.load(directory, "rf_revenue", forests["rf_revenue"]["max_depth"])
+            models.rf_expenditure_engine = FlatForest.load(directory, "rf_expenditure", forests["rf_expenditure"]["max_depth"])
+        if "rf_multi" in forests:
+            models.multi_output_engine = FlatForest.load(directory, "rf_multi", forests["rf_multi"]["max_depth"])
+        
+        models.warm_up()
+        return models
+
+    def export_shared(self, directory):
+        """Write the verified fast-path arrays in the layout load_shared memory-maps"""
+        if self.linear_weights is None:
+            raise ValueError("The default models could not be folded into linear weights, so they can't be shared")
+        if self.has_random_forest and self.rf_revenue_engine is None:
+            raise ValueError("The Random Forests could not be flattened, so they can't be shared")
+        if self.has_multi_output and self.multi_output_engine is None:
+            raise ValueError("The multi-output forest could not be flattened, so it can't be shared")
+        
+        n_features = len(FEATURE_NAMES)
+        mean = getattr(self.scaler, 'mean_', None)
+        scale = getattr(self.scaler, 'scale_', None)
+        arrays = {
+            "linear_weights": self.linear_weights,
+            "linear_intercepts": self.linear_intercepts,
+            "scaler_mean": mean if mean is not None else np.zeros(n_features),
+            "scaler_scale": scale if scale is not None else np.ones(n_features)
+        }
+        for name, array in arrays.items():
+            save_array(os.path.join(directory, f"{name}.npy"), array)
+        
+        engines = [
+            ("rf_revenue", self.rf_revenue_engine),
+            ("rf_expenditure", self.rf_expenditure_engine),
+            ("rf_multi", self.multi_output_engine)
+        ]
+        forests = {}
+        for name, engine in engines:
+            if engine is not None:
+                engine.save(directory, name)
+                forests[name] = {"max_depth": engine.max_depth, "trees": engine.n_trees, "nodes": engine.n_nodes}
+        
+        manifest = {
+            "source_version": self.version,
+            "source_fingerprint": [list(entry) for entry in self.fingerprint],
+            "forests": forests
+        }
+        manifest_path = os.path.join(directory, "manifest.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    @property
+    def has_random_forest(self):
+        sklearn_pair = self.rf_revenue_model is not None and self.rf_expenditure_model is not None
+        return sklearn_pair or self.rf_revenue_engine is not None
+
+    @property
+    def has_multi_output(self):
+        return self.multi_output_model is not None or self.multi_output_engine is not None
+
+    def unavailable_error(self, model_type):
+        """Error message if model_type needs artifacts this set doesn't have, else None"""
+        if model_type == "random_forest" and not self.has_random_forest:
+            return "Random Forest models are not available. Please use 'default' model type."
+        if model_type == "multi_output" and not self.has_multi_output:
+            return "The multi-output model is not available. Please use 'default' model type."
+        return None
+
+    def prepare_fast_paths(self):
+        if FAST_LINEAR_INFERENCE:
+            folded = fold_linear_models(self.scaler, [self.revenue_model, self.expenditure_model])
+            if folded is not None and check_linear_parity(self, *folded):
+                self.linear_weights, self.linear_intercepts = folded
+            elif folded is not None:
+                print("Warning: folded linear weights do not match the sklearn models, using the sklearn path")
+        
+        if self.rf_revenue_model is not None and FAST_FOREST_INFERENCE:
+            revenue_engine = FlatForest.from_sklearn(self.rf_revenue_model)
+            expenditure_engine = FlatForest.from_sklearn(self.rf_expenditure_model)
+            if (check_forest_parity(self.rf_revenue_model, revenue_engine)
+                    and check_forest_parity(self.rf_expenditure_model, expenditure_engine)):
+                self.rf_revenue_engine, self.rf_expenditure_engine = revenue_engine, expenditure_engine
+            else:
+                print("Warning: flattened Random Forests do not match the sklearn models, using the sklearn path")
+        
+        if self.multi_output_model is not None and FAST_FOREST_INFERENCE:
+            engine = FlatForest.from_sklearn(self.multi_output_model)
+            if check_forest_parity(self.multi_output_model, engine):
+                self.multi_output_engine = engine
+            else:
+                print("Warning: flattened multi-output forest does not match the sklearn model, using the sklearn path")
+
+    def warm_up(self):
+        """Run a dummy prediction through every path so the first real request isn't slow"""
+        history = np.tile([[1000000.0, 700000.0, 300000.0]], (1, 4, 1))
+        features, avg_revenue, avg_expenditure, scale_factor = build_features_from_history(history)
+        for model_type in ["default"] + [model_type for model_type in FOREST_MODEL_TYPES if not self.unavailable_error(model_type)]:
+            revenue, expenditure = predict_features(features, model_type, self)
+            if not self.shared:
+                predict_features_sklearn(features, model_type, self)
+            if not (np.isfinite(revenue).all() and np.isfinite(expenditure).all()):
+                raise ValueError(f"Warm-up prediction for '{model_type}' is not finite")
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "model_dir": self.model_dir,
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+            "fast_linear": self.linear_weights is not None,
+            "fast_forest": self.rf_revenue_engine is not None,
+            "rf_artifact": RF_ARTIFACT,
+            "multi_output": self.has_multi_output,
+            "shared": self.shared
+        }
+
+def predict_features(features, model_type, models=None):
+    """Predict revenue and expenditure for a raw (unscaled) feature matrix"""
+    # Read the active set once so a swap mid-call can't mix two versions
+    models = models or registry.active
+    
+    if model_type not in FOREST_MODEL_TYPES and models.linear_weights is not None:
+        # Scaling is folded into the weights, so this is the whole predict stage
+        with metrics.stage("predict"):
+            predictions = features @ models.linear_weights + models.linear_intercepts
+        return predictions[:, 0], predictions[:, 1]
+    
+    # Shared model sets have no sklearn forests to fall back on for large batches
+    small_batch = len(features) <= FOREST_ENGINE_MAX_ROWS
+    if model_type == "random_forest" and models.rf_revenue_engine is not None and (small_batch or models.rf_revenue_model is None):
+        with metrics.stage("scale"):
+            scaled_features = scale_features(features, models.scaler)
+        with metrics.stage("predict"):
+            return models.rf_revenue_engine.predict(scaled_features), models.rf_expenditure_engine.predict(scaled_features)
+    
+    if model_type == "multi_output" and models.multi_output_engine is not None and (small_batch or models.multi_output_model is None):
+        # One traversal of the joint forest yields both targets
+        with metrics.stage("scale"):
+            scaled_features = scale_features(features, models.scaler)
+        with metrics.stage("predict"):
+            predictions = models.multi_output_engine.predict(scaled_features)
+        return predictions[:, 0], predictions[:, 1]
+    
+    return predict_features_sklearn(features, model_type, models)
+
+class ModelRegistry:
+    """Holds the active model set and swaps in retrained artifacts without a restart
+
+    New artifacts are loaded and warmed up off the request path, then published with a
+    single reference assignment, so in-flight requests finish on the set they started
+    with. The previous set is kept in memory for rollback.
+    """
+
+    def __init__(self, model_dir, watch_interval=5.0):
+        self.model_dir = model_dir
+        self.watch_interval = watch_interval
+        self.active = None
+        self.previous = None
+        self.last_error = None
+        self.swap_callbacks = []
+        self.reload_lock = threading.Lock()
+        # Artifacts on disk we rolled back from, which the watcher shouldn't reload again
+        self.ignored_fingerprint = None
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def load_initial(self):
+        self.active = ModelSet.load(self.model_dir)
+
+    def disk_fingerprint(self):
+        return artifact_fingerprint(model_artifact_paths(self.model_dir, shared=SHARED_MODELS).values())
+
+    def _publish(self, active, previous):
+        self.active, self.previous = active, previous
+        for callback in self.swap_callbacks:
+            callback()
+
+    def reload(self, force=False):
+        """Load the artifacts on disk and swap them in; returns True if the active set changed"""
+        with self.reload_lock:
+            if not force and self.disk_fingerprint() == self.active.fingerprint:
+                return False
+            
+            try:
+                candidate = ModelSet.load(self.model_dir)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Warning: model reload failed, keeping version {self.active.version}: {self.last_error}")
+                return False
+            
+            self.last_error = None
+            self.ignored_fingerprint = None
+            self._publish(candidate, self.active)
+            print(f"Model set {candidate.version} is now active")
+            return True
+
+    def rollback(self):
+        """Swap the previous model set back in; returns False if there is none"""
+        with self.reload_lock:
+            if self.previous is None:
+                return False
+            
+            self.ignored_fingerprint = self.active.fingerprint
+            self._publish(self.previous, self.active)
+            print(f"Rolled back to model set {self.active.version}")
+            return True
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.watch_interval):
+            fingerprint = self.disk_fingerprint()
+            if fingerprint in (self.active.fingerprint, self.ignored_fingerprint):
+                pending = None
+                continue
+            
+            # Wait until the files stop changing so we don't load a half-written retrain
+            if fingerprint != pending:
+                pending = fingerprint
+                continue
+            
+            self.reload()
+            pending = None
+
+    def start_watching(self):
+        if self.watch_interval > 0 and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        self._watcher = None
+
+    def status(self):
+        return {
+            "active": self.active.describe(),
+            "previous": self.previous.describe() if self.previous is not None else None,
+            "watch_interval_seconds": self.watch_interval,
+            # In shared mode only the export is watched; the multi-worker launcher (or
+            # `python app.py --export-shared`) refreshes it when the trained models change
+            "watching": "shared export" if SHARED_MODELS else "trained artifacts",
+            "last_error": self.last_error
+        }
+
+# Load the trained models; MODEL_WATCH_INTERVAL (seconds, 0 disables) controls hot reloading
+registry = ModelRegistry(MODEL_DIR, watch_interval=float(os.environ.get("MODEL_WATCH_INTERVAL", "5")))
+registry.load_initial()
+
+def adjust_predictions(revenue, expenditure, avg_revenue, avg_expenditure, scale_factor):
+    """Scale predictions back down and keep expenditure in line with the input ratio"""
+    revenue = revenue / scale_factor
+    expenditure = expenditure / scale_factor
+    
+    # Additional adjustment for expenditure to maintain similar ratio as input
+    # This helps ensure the expenditure prediction is more aligned with the input pattern
+    input_rev_exp_ratio = np.divide(avg_revenue, avg_expenditure, out=np.ones_like(avg_revenue), where=avg_expenditure > 0)
+    predicted_rev_exp_ratio = np.divide(revenue, expenditure, out=np.ones_like(revenue), where=expenditure > 0)
+    
+    # If the predicted ratio is significantly different from the input ratio, adjust expenditure
+    drifted = np.abs(input_rev_exp_ratio - predicted_rev_exp_ratio) / input_rev_exp_ratio > 0.3  # 30% threshold
+    expenditure = np.where(drifted, revenue / input_rev_exp_ratio, expenditure)
+    
+    # Calculate gross profit
+    return revenue, expenditure, revenue - expenditure
+
+class ForecastCache:
+    """Bounded LRU cache of forecasts with a time-to-live
+
+    Keys are (model_type, rounded past quarters). The cache remembers which model
+    artifacts its entries were computed with and clears itself when they change.
+    """
+
+    def __init__(self, max_size=10000, ttl=300.0, precision=2):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.precision = precision
+        self.fingerprint = None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def make_key(self, model_type, quarters):
+        """Canonicalize the request inputs so equivalent requests share an entry"""
+        return (model_type, tuple(
+            (round(q.revenue, self.precision), round(q.expenditure, self.precision), round(q.gross_profit, self.precision))
+            for q in quarters
+        ))
+
+    def _sync(self, fingerprint):
+        # Drop everything computed with a different set of model artifacts
+        if fingerprint != self.fingerprint:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.fingerprint = fingerprint
+
+    def get(self, key, fingerprint):
+        with self.lock:
+            self._sync(fingerprint)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, expires_at = entry
+            if self.ttl > 0 and time.monotonic() >= expires_at:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, fingerprint):
+        with self.lock:
+            self._sync(fingerprint)
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+# Forecast cache, sized with FORECAST_CACHE_SIZE (0 disables it) and FORECAST_CACHE_TTL in seconds
+forecast_cache = ForecastCache(
+    max_size=int(os.environ.get("FORECAST_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("FORECAST_CACHE_TTL", "300"))
+)
+
+def predict_and_adjust(features, avg_revenue, avg_expenditure, scale_factor, model_type):
+    """Run prediction and post-processing for a feature matrix (executed on the inference pool)"""
+    revenue_predictions, expenditure_predictions = predict_features(features, model_type)
+    with metrics.stage("postprocess"):
+        return adjust_predictions(revenue_predictions, expenditure_predictions, avg_revenue, avg_expenditure, scale_factor)
+
+def timed_call(fn, submitted_at, *args):
+    """Call fn in a pool worker and report how long it queued and how long it ran"""
+    started_at = time.time()
+    result = fn(*args)
+    return result, started_at - submitted_at, time.time() - started_at
+
+class PoolSaturatedError(Exception):
+    """Raised when the inference pool already has as much work queued as it allows"""
+
+class InferencePool:
+    """Runs blocking model inference off the event loop with a bounded queue
+
+    At most `workers` calls run at once and at most `queue_depth` more wait for a
+    worker. Anything beyond that is rejected so callers can answer 503 instead of
+    piling up latency.
+    """
+
+    def __init__(self, kind="thread", workers=None, queue_depth=64):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_depth = queue_depth
+        self.executor = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_queue_wait = 0.0
+        self.total_compute = 0.0
+
+    def _get_executor(self):
+        # Created lazily so importing the app doesn't fork worker processes
+        if self.executor is None:
+            if self.kind == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self.executor
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool, returning (result, queue_wait_seconds, compute_seconds)"""
+        if self.in_flight >= self.workers + self.queue_depth:
+            self.rejected += 1
+            raise PoolSaturatedError(f"Inference pool is saturated ({self.in_flight} requests in flight)")
+        
+        # Only the event loop touches in_flight, so no lock is needed
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            call_args = (timed_call, fn, time.time()) + args
+            if self.kind != "process":
+                # Carry the request's metric labels into the worker thread
+                call_args = (contextvars.copy_context().run,) + call_args
+            result, queue_wait, compute = await loop.run_in_executor(self._get_executor(), *call_args)
+        finally:
+            self.in_flight -= 1
+        
+        self.completed += 1
+        self.total_queue_wait += queue_wait
+        self.total_compute += compute
+        return result, queue_wait, compute
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def restart(self):
+        """Replace worker processes so they pick up newly loaded models
+
+        Calls already submitted finish on the old workers. Threads share the registry
+        with the event loop, so a thread pool doesn't need restarting.
+        """
+        if self.kind == "process" and self.executor is not None:
+            executor, self.executor = self.executor, None
+            executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": self.total_queue_wait / self.completed * 1000 if self.completed else 0.0,
+            "avg_compute_ms": self.total_compute / self.completed * 1000 if self.completed else 0.0
+        }
+
+# Inference pool: INFERENCE_POOL is 'thread' or 'process', sized with INFERENCE_WORKERS and INFERENCE_QUEUE_DEPTH
+inference_pool = InferencePool(
+    kind=os.environ.get("INFERENCE_POOL", "thread"),
+    workers=int(os.environ.get("INFERENCE_WORKERS", "0")) or None,
+    queue_depth=int(os.environ.get("INFERENCE_QUEUE_DEPTH", "64"))
+)
+registry.swap_callbacks.append(inference_pool.restart)
+
+def uses_fast_path(model_type):
+    """Whether a model type is served by the folded linear weights"""
+    return model_type not in FOREST_MODEL_TYPES and registry.active.linear_weights is not None
+
+async def run_inference(features, avg_revenue, avg_expenditure, scale_factor, model_type, response=None):
+    """Predict a feature matrix without blocking the event loop"""
+    # The folded linear path is a few microseconds, cheaper than handing it to a worker
+    if uses_fast_path(model_type):
+        return predict_and_adjust(features, avg_revenue, avg_expenditure, scale_factor, model_type)
+    
+    try:
+        result, queue_wait, compute = await inference_pool.run(
+            predict_and_adjust, features, avg_revenue, avg_expenditure, scale_factor, model_type
+        )
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    metrics.observe_stage("queue_wait", queue_wait)
+    
+    if response is not None:
+        response.headers["X-Queue-Wait-Ms"] = f"{queue_wait * 1000:.3f}"
+        response.headers["X-Compute-Ms"] = f"{compute * 1000:.3f}"
+    
+    return result
+
+class ForecastCoalescer:
+    """Collects concurrent single-company forecasts into one batched predict per model type
+
+    The first request for a model type opens a batch window. The batch is sent to the
+    inference pool when the window closes or when it reaches max_batch_size, whichever
+    comes first, so no request waits more than the window plus one batched predict.
+    """
+
+    def __init__(self, window_ms=0.0, max_batch_size=64):
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.pending = {}
+        self.timers = {}
+        # The event loop only keeps weak references to tasks, so running batches are held here
+        self.tasks = set()
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_batch_size > 1
+
+    async def submit(self, model_type, features, avg_revenue, avg_expenditure, scale_factor):
+        """Queue one feature row and wait for its (revenue, expenditure, gross_profit) forecast"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        batch = self.pending.setdefault(model_type, [])
+        batch.append((features, avg_revenue, avg_expenditure, scale_factor, future))
+        
+        if len(batch) >= self.max_batch_size:
+            self._flush(model_type)
+        elif len(batch) == 1:
+            self.timers[model_type] = loop.call_later(self.window, self._flush, model_type)
+        
+        return await future
+
+    def _flush(self, model_type):
+        timer = self.timers.pop(model_type, None)
+        if timer is not None:
+            timer.cancel()
+        
+        batch = self.pending.pop(model_type, None)
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(model_type, batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run_batch(self, model_type, batch):
+        self.batches += 1
+        self.items += len(batch)
+        
+        features = np.vstack([item[0] for item in batch])
+        avg_revenue, avg_expenditure, scale_factor = (
+            np.concatenate([item[i] for item in batch]) for i in range(1, 4)
+        )
+        
+        try:
+            revenue, expenditure, gross_profit = await run_inference(
+                features, avg_revenue, avg_expenditure, scale_factor, model_type
+            )
+        except Exception as e:
+            for item in batch:
+                if not item[-1].done():
+                    item[-1].set_exception(e)
+            return
+        
+        # Fan results back out to the waiting requests (skipping any that disconnected)
+        for row, item in enumerate(batch):
+            if not item[-1].done():
+                item[-1].set_result((float(revenue[row]), float(expenditure[row]), float(gross_profit[row])))
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0
+        }
+
+# Opt-in request coalescing for /forecast, enabled by setting FORECAST_BATCH_WINDOW_MS above 0
+forecast_coalescer = ForecastCoalescer(
+    window_ms=float(os.environ.get("FORECAST_BATCH_WINDOW_MS", "0")),
+    max_batch_size=int(os.environ.get("FORECAST_MAX_BATCH_SIZE", "64"))
+)
+
+def begin_request_metrics(http_request, endpoint, model_type):
+    """Label this request's stage timings and record the time spent before the handler ran"""
+    if not metrics.enabled:
+        return
+    
+    # Unknown model types are served by the default models, so don't let them create new series
+    model_label = model_type if model_type in CONFIDENCE_SCORES else "default"
+    request_labels.set((("endpoint", endpoint), ("model_type", model_label)))
+    http_request.scope["metrics_model_type"] = model_label
+    
+    # Reading the body plus Pydantic validation (including validate_gross_profit)
+    start = http_request.scope.get("metrics_start")
+    if start is not None:
+        metrics.observe_stage("validate", time.perf_counter() - start)
+
+def format_validation_error(error):
+    """Flatten a pydantic validation error into a single readable line"""
+    messages = []
+    for err in error.errors():
+        location = '.'.join(str(part) for part in err['loc'])
+        messages.append(f"{location}: {err['msg']}" if location else err['msg'])
+    return "; ".join(messages)
+
 @app.get("/")
 async def root():
     return {"message": "Budget Forecast API is running. Access /docs for API documentation."}
 
+@app.on_event("startup")
+def start_model_watcher():
+    registry.start_watching()
+
+@app.on_event("shutdown")
+def shutdown_inference_pool():
+    registry.stop_watching()
+    inference_pool.shutdown()
+
 @app.post("/forecast", response_model=ForecastResponse)
 async def forecast(
+    http_request: Request,
+    response: Response,
     request: ForecastRequest = Body(...),
-    model_type: str = Query("default", description="Model type to use for prediction: 'default' or 'random_forest'")
+    model_type: str = Query("default", description="Model type to use for prediction: 'default', 'random_forest' or 'multi_output'")
 ):
+    begin_request_metrics(http_request, "/forecast", model_type)
+    
     try:
-        # Check if Random Forest models are available when requested
-        if model_type == "random_forest" and (rf_revenue_model is None or rf_expenditure_model is None):
-            return {"error": "Random Forest models are not available. Please use 'default' model type."}
-        
-        # Extract features from the request
-        quarters = request.past_quarters
-        
-        # Determine scale factor based on input data
-        # If the average revenue is less than 1 million, we'll scale up for prediction
-        avg_revenue = sum(q.revenue for q in quarters) / len(quarters)
-        avg_expenditure = sum(q.expenditure for q in quarters) / len(quarters)
-        scale_factor = 1.0
-        
-        # If average revenue is less than 1 million, apply scaling
-        if avg_revenue < 1000000:
-            # Calculate appropriate scale factor (roughly to millions)
-            magnitude = np.log10(avg_revenue)
-            if magnitude < 6:  # Less than 1 million
-                scale_factor = 10 ** (6 - int(magnitude))
-        
-        # Create feature array
-        features = []
-        
-        # Add features in reverse order (most recent first)
-        for i, quarter in enumerate(reversed(quarters)):
-            lag = i + 1
-            # Apply scaling to input features if needed
-            scaled_revenue = quarter.revenue * scale_factor
-            scaled_expenditure = quarter.expenditure * scale_factor
-            scaled_gross_profit = quarter.gross_profit * scale_factor
-            
-            features.extend([
-                scaled_revenue,
-                scaled_expenditure,
-                scaled_gross_profit,
-                scaled_revenue + scaled_gross_profit  # Total income approximation
-            ])
-        
-        # Reshape features to match model input
-        feature_names = []
-        for lag in range(1, 5):
-            for metric in ['Revenue', 'Expenditure', 'Gross_Profit', 'Total_Income']:
-                feature_names.append(f"{metric}_Lag{lag}")
-        
-        # Create DataFrame with correct feature names
-        features_df = pd.DataFrame([features], columns=feature_names)
-        
-        # Scale features
-        scaled_features = scaler.transform(features_df)
-        
-        # Make predictions based on selected model type
-        if model_type == "random_forest" and rf_revenue_model is not None:
-            revenue_prediction = rf_revenue_model.predict(scaled_features)[0]
-            expenditure_prediction = rf_expenditure_model.predict(scaled_features)[0]
-            confidence_score = 0.88  # Based on RF model evaluation
-        else:
-            revenue_prediction = revenue_model.predict(scaled_features)[0]
-            expenditure_prediction = expenditure_model.predict(scaled_features)[0]
-            confidence_score = 0.89  # Based on default model evaluation
-        
-        # Scale predictions back down if we scaled up
-        if scale_factor > 1.0:
-            revenue_prediction = revenue_prediction / scale_factor
-            expenditure_prediction = expenditure_prediction / scale_factor
+        # Check that the requested model type's artifacts are loaded
+        unavailable = registry.active.unavailable_error(model_type)
+        if unavailable:
+            raise HTTPException(status_code=400, detail=unavailable)
         
-        # Additional adjustment for expenditure to maintain similar ratio as input
-        # This helps ensure the expenditure prediction is more aligned with the input pattern
-        input_rev_exp_ratio = avg_revenue / avg_expenditure if avg_expenditure > 0 else 1
-        predicted_rev_exp_ratio = revenue_prediction / expenditure_prediction if expenditure_prediction > 0 else 1
+        # Serve repeated inputs from the cache, keyed to the model version that computed them
+        cached = None
+        model_version = registry.active.version
+        if forecast_cache.enabled:
+            cache_key = forecast_cache.make_key(model_type, request.past_quarters)
+            cached = forecast_cache.get(cache_key, model_version)
         
-        # If the predicted ratio is significantly different from the input ratio, adjust expenditure
-        if abs(input_rev_exp_ratio - predicted_rev_exp_ratio) / input_rev_exp_ratio > 0.3:  # 30% threshold
-            expenditure_prediction = revenue_prediction / input_rev_exp_ratio
+        if cached is None:
+            with metrics.stage("features"):
+                features, avg_revenue, avg_expenditure, scale_factor = build_feature_matrix([request])
+            
+            if forecast_coalescer.enabled and not uses_fast_path(model_type):
+                cached = await forecast_coalescer.submit(
+                    model_type, features, avg_revenue, avg_expenditure, scale_factor
+                )
+            else:
+                revenue_prediction, expenditure_prediction, gross_profit_prediction = await run_inference(
+                    features, avg_revenue, avg_expenditure, scale_factor, model_type, response
+                )
+                cached = (float(revenue_prediction[0]), float(expenditure_prediction[0]), float(gross_profit_prediction[0]))
+            
+            if forecast_cache.enabled:
+                forecast_cache.put(cache_key, cached, model_version)
         
-        # Calculate gross profit
-        gross_profit_prediction = revenue_prediction - expenditure_prediction
+        revenue_prediction, expenditure_prediction, gross_profit_prediction = cached
         
         # Create response
-        response = ForecastResponse(
+        return ForecastResponse(
             company_name=request.company_name,
-            next_quarter_revenue=float(revenue_prediction),
-            next_quarter_expenditure=float(expenditure_prediction),
-            next_quarter_gross_profit=float(gross_profit_prediction),
-            confidence_score=confidence_score
+            next_quarter_revenue=revenue_prediction,
+            next_quarter_expenditure=expenditure_prediction,
+            next_quarter_gross_profit=gross_profit_prediction,
+            confidence_score=CONFIDENCE_SCORES.get(model_type, CONFIDENCE_SCORES["default"])
         )
-        
-        return response
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+@app.post("/forecast/batch", response_model=BatchForecastResponse)
+async def forecast_batch(
+    http_request: Request,
+    response: Response,
+    request: BatchForecastRequest = Body(...),
+    model_type: str = Query("default", description="Model type to use for prediction: 'default', 'random_forest' or 'multi_output'")
+):
+    """Forecast many companies with one scaler call and one predict call per target"""
+    begin_request_metrics(http_request, "/forecast/batch", model_type)
+    
+    unavailable = registry.active.unavailable_error(model_type)
+    if unavailable:
+        raise HTTPException(status_code=400, detail=unavailable)
+    
+    results = [None] * len(request.companies)
+    
+    # Validate each company separately and keep track of where the valid ones came from
+    valid_requests = []
+    valid_indices = []
+    with metrics.stage("validate_items"):
+        for index, item in enumerate(request.companies):
+            try:
+                valid_requests.append(ForecastRequest.parse_obj(item))
+                valid_indices.append(index)
+            except ValidationError as e:
+                results[index] = BatchForecastItem(index=index, error=f"Invalid input: {format_validation_error(e)}")
+    
+    if valid_requests:
+        try:
+            with metrics.stage("features"):
+                features, avg_revenue, avg_expenditure, scale_factor = build_feature_matrix(valid_requests)
+            revenue_predictions, expenditure_predictions, gross_profit_predictions = await run_inference(
+                features, avg_revenue, avg_expenditure, scale_factor, model_type, response
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+        
+        finite = np.isfinite(revenue_predictions) & np.isfinite(expenditure_predictions)
+        confidence_score = CONFIDENCE_SCORES.get(model_type, CONFIDENCE_SCORES["default"])
+        
+        for row, index in enumerate(valid_indices):
+            if not finite[row]:
+                results[index] = BatchForecastItem(index=index, error="Prediction error: forecast is not a finite number")
+                continue
+            
+            results[index] = BatchForecastItem(
+                index=index,
+                forecast=ForecastResponse(
+                    company_name=valid_requests[row].company_name,
+                    next_quarter_revenue=float(revenue_predictions[row]),
+                    next_quarter_expenditure=float(expenditure_predictions[row]),
+                    next_quarter_gross_profit=float(gross_profit_predictions[row]),
+                    confidence_score=confidence_score
+                )
+            )
+    
+    failed = sum(1 for item in results if item.error is not None)
+    if failed:
+        metrics.inc("forecast_batch_item_errors_total", (("model_type", http_request.scope.get("metrics_model_type", model_type)),), failed)
+    
+    return BatchForecastResponse(
+        model_type=model_type,
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results
+    )
+
+# Companies predicted per vectorized call when streaming bulk forecasts
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "1024"))
+
+# Accepted input column names (case-insensitive) for bulk CSV uploads
+BULK_INPUT_COLUMNS = {
+    'company_id': ['company_id', 'company'],
+    'revenue': ['revenue'],
+    'expenditure': ['expenditure'],
+    'gross_profit': ['gross_profit']
+}
+
+BULK_OUTPUT_COLUMNS = ['company_id', 'next_quarter_revenue', 'next_quarter_expenditure',
+                       'next_quarter_gross_profit', 'confidence_score', 'error']
+
+class RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse for bodies generated while the request is still being read
+
+    StreamingResponse normally watches receive() for a client disconnect, which would
+    consume the upload chunks the body iterator is reading. A disconnect still surfaces
+    through the request stream instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+async def read_body_lines(http_request):
+    """Yield lines from a streamed request body without holding the whole body"""
+    buffer = b""
+    async for chunk in http_request.stream():
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+def parse_bulk_header(line):
+    """Map the required bulk input columns to their positions in the CSV header"""
+    header = [name.strip().lower() for name in next(csv.reader([line]))]
+    positions = {}
+    for column, aliases in BULK_INPUT_COLUMNS.items():
+        matches = [header.index(alias) for alias in aliases if alias in header]
+        if not matches:
+            raise ValueError(f"Missing required column '{column}'")
+        positions[column] = matches[0]
+    return positions
+
+def validate_bulk_history(rows):
+    """Check one company's last 4 quarters with the same rules as QuarterData"""
+    if len(rows) < 4:
+        return f"Need at least 4 quarters of history, got {len(rows)}"
+    for revenue, expenditure, gross_profit in rows:
+        if revenue <= 0 or expenditure <= 0:
+            return "Revenue and expenditure must be greater than 0"
+        if abs(gross_profit - (revenue - expenditure)) > 0.01:
+            return f"Gross profit should equal revenue - expenditure. Expected: {revenue - expenditure}"
+    return None
+
+def encode_bulk_results(results, output_format):
+    """Encode a chunk of (company_id, forecast or None, error or None) results"""
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for company_id, forecast, error in results:
+            writer.writerow([company_id] + (list(forecast) if forecast else ["", "", "", ""]) + [error or ""])
+        return buffer.getvalue()
+    
+    lines = []
+    for company_id, forecast, error in results:
+        if forecast is None:
+            lines.append(json.dumps({"company_id": company_id, "error": error}))
+        else:
+            lines.append(json.dumps(dict(zip(BULK_OUTPUT_COLUMNS, (company_id,) + forecast))))
+    return "\n".join(lines) + "\n"
+
+async def predict_bulk_chunk(companies, model_type, output_format):
+    """Forecast a chunk of (company_id, rows, error) companies with one vectorized call"""
+    valid = [i for i, (_, _, error) in enumerate(companies) if error is None]
+    forecasts = [None] * len(companies)
+    
+    if valid:
+        history = np.array([companies[i][1][-4:] for i in valid], dtype=float)
+        with metrics.stage("features"):
+            features, avg_revenue, avg_expenditure, scale_factor = build_features_from_history(history)
+        
+        # Wait for room on the inference pool rather than failing half-way through the stream
+        while True:
+            try:
+                revenue, expenditure, gross_profit = await run_inference(
+                    features, avg_revenue, avg_expenditure, scale_factor, model_type
+                )
+                break
+            except HTTPException as e:
+                if e.status_code != 503:
+                    raise
+                await asyncio.sleep(0.05)
+        
+        confidence_score = CONFIDENCE_SCORES.get(model_type, CONFIDENCE_SCORES["default"])
+        for row, i in enumerate(valid):
+            forecasts[i] = (float(revenue[row]), float(expenditure[row]), float(gross_profit[row]), confidence_score)
+    
+    results = []
+    for (company_id, _, error), forecast in zip(companies, forecasts):
+        if forecast is not None and not all(np.isfinite(forecast)):
+            forecast, error = None, "Prediction error: forecast is not a finite number"
+        results.append((company_id, forecast, error))
+    
+    return encode_bulk_results(results, output_format)
+
+async def stream_bulk_forecasts(lines, positions, model_type, output_format):
+    """Group streamed CSV rows into per-company windows and yield forecasts chunk by chunk"""
+    if output_format == "csv":
+        yield ",".join(BULK_OUTPUT_COLUMNS) + "\n"
+    
+    chunk = []
+    company_id = None
+    rows = []
+    error = None
+    
+    def finish_company():
+        # Rows are only kept for the current company, so memory doesn't grow with the file
+        chunk.append((company_id, rows[-4:], error or validate_bulk_history(rows)))
+    
+    async for line in lines:
+        if not line.strip():
+            continue
+        
+        fields = next(csv.reader([line]))
+        row_company = fields[positions['company_id']].strip() if len(fields) > positions['company_id'] else ""
+        
+        if row_company != company_id:
+            if company_id is not None:
+                finish_company()
+            company_id, rows, error = row_company, [], None
+            
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                yield await predict_bulk_chunk(chunk, model_type, output_format)
+                chunk = []
+        
+        if error is not None:
+            continue
+        try:
+            rows.append((
+                float(fields[positions['revenue']]),
+                float(fields[positions['expenditure']]),
+                float(fields[positions['gross_profit']])
+            ))
+            # Only the most recent 4 quarters are used for the forecast
+            if len(rows) > 4:
+                rows.pop(0)
+        except (ValueError, IndexError):
+            error = "Invalid or missing revenue, expenditure or gross_profit value"
+    
+    if company_id is not None:
+        finish_company()
+    if chunk:
+        yield await predict_bulk_chunk(chunk, model_type, output_format)
+
+@app.post("/forecast/bulk")
+async def forecast_bulk(
+    http_request: Request,
+    model_type: str = Query("default", description="Model type to use for prediction: 'default', 'random_forest' or 'multi_output'"),
+    output_format: str = Query("ndjson", description="Response format: 'ndjson' or 'csv'")
+):
+    """Stream forecasts for a CSV upload of quarterly history
+
+    The request body is a CSV with company_id, revenue, expenditure and gross_profit
+    columns, one row per quarter, grouped by company and oldest to newest. Each company
+    is forecast from its last 4 quarters, and results are streamed back in chunks.
+    """
+    if output_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="output_format must be 'ndjson' or 'csv'")
+    unavailable = registry.active.unavailable_error(model_type)
+    if unavailable:
+        raise HTTPException(status_code=400, detail=unavailable)
+    
+    begin_request_metrics(http_request, "/forecast/bulk", model_type)
+    
+    # Read the header up front so a bad upload is rejected before streaming starts
+    lines = read_body_lines(http_request)
+    try:
+        positions = parse_bulk_header(await lines.__anext__())
+    except StopAsyncIteration:
+        raise HTTPException(status_code=400, detail="Empty upload")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return RequestStreamingResponse(stream_bulk_forecasts(lines, positions, model_type, output_format), media_type=media_type)
+
 @app.get("/models")
 async def get_available_models():
     """Get information about available prediction models"""
@@ -178,17 +1315,134 @@ async def get_available_models():
         }
     }
     
-    if rf_revenue_model is not None and rf_expenditure_model is not None:
+    if registry.active.has_random_forest:
         models["random_forest"] = {
             "revenue": "Random Forest (91.61% accuracy)",
             "expenditure": "Random Forest (84.97% accuracy)",
             "overall_accuracy": "88.29%"
         }
     
+    if registry.active.has_multi_output:
+        models["multi_output"] = {
+            "revenue": "Random Forest (multi-output, shared with expenditure)",
+            "expenditure": "Random Forest (multi-output, shared with revenue)",
+            "description": "One forest predicting both targets in a single pass"
+        }
+    
     return {
         "available_models": list(models.keys()),
-        "model_details": models
+        "model_details": models,
+        "active_version": registry.active.version,
+        "registry": registry.status()
     }
 
+@app.post("/models/reload")
+async def reload_models():
+    """Load the artifacts currently on disk in the background and swap them in"""
+    loop = asyncio.get_running_loop()
+    swapped = await loop.run_in_executor(None, partial(registry.reload, force=True))
+    if not swapped:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {registry.last_error}")
+    return {"active_version": registry.active.version, "previous_version": registry.previous.version}
+
+@app.post("/models/rollback")
+async def rollback_models():
+    """Swap the previously active model set back in"""
+    # rollback waits for any reload in progress, which can take seconds, so keep it off the event loop
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, registry.rollback):
+        raise HTTPException(status_code=409, detail="No previous model version to roll back to")
+    return {"active_version": registry.active.version, "previous_version": registry.previous.version}
+
+@app.get("/inference/pool")
+async def get_inference_pool_stats():
+    """Get inference pool load, rejections, average queue-wait vs compute time and coalescing"""
+    return {**inference_pool.stats(), "coalescer": forecast_coalescer.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose request, error and per-stage latency metrics in Prometheus text format"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    
+    # Snapshot the cache and inference pool counters alongside the request metrics
+    for name, value in forecast_cache.stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.set_gauge(f"forecast_cache_{name}", value)
+    for name, value in inference_pool.stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.set_gauge(f"inference_pool_{name}", value)
+    
+    return metrics.render()
+
+@app.get("/cache")
+async def get_cache_stats():
+    """Get forecast cache counters for sizing the cache"""
+    return forecast_cache.stats()
+
+def export_shared_models(model_dir):
+    """Write the shared export from the trained models; returns False, saying why, if they can't be shared"""
+    try:
+        ModelSet.load(model_dir, shared=False).export_shared(shared_model_dir(model_dir))
+    except ValueError as e:
+        print(f"Warning: not sharing the models between workers: {e}")
+        return False
+    return True
+
+def watch_shared_export(model_dir, interval):
+    """Re-export whenever the trained artifacts change, so workers serving the export pick up retrains
+
+    Runs in the launcher process. Like the registry's watcher, it waits until the files
+    stop changing; a retrain that can't be shared leaves the workers on the last export.
+    """
+    def watch():
+        exported = artifact_fingerprint(model_artifact_paths(model_dir).values())
+        pending = None
+        while True:
+            time.sleep(interval)
+            fingerprint = artifact_fingerprint(model_artifact_paths(model_dir).values())
+            if fingerprint == exported:
+                pending = None
+                continue
+            if fingerprint != pending:
+                pending = fingerprint
+                continue
+            
+            try:
+                if export_shared_models(model_dir):
+                    print("Shared model export refreshed from the retrained models")
+                else:
+                    print("Warning: workers keep serving the previous export; restart to serve the retrained models")
+            except Exception as e:
+                print(f"Warning: refreshing the shared model export failed: {type(e).__name__}: {e}")
+            exported, pending = fingerprint, None
+    
+    threading.Thread(target=watch, name="shared-export-watcher", daemon=True).start()
+
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the PaisaWise forecast API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="Worker processes; more than one disables auto-reload and shares the models")
+    parser.add_argument("--export-shared", action="store_true",
+                        help="Write the memory-mappable model export to MODEL_DIR/shared and exit")
+    args = parser.parse_args()
+    
+    if args.export_shared:
+        directory = shared_model_dir(MODEL_DIR)
+        ModelSet.load(MODEL_DIR, shared=False).export_shared(directory)
+        print(f"Shared model export written to {directory}")
+    elif args.workers > 1:
+        # Workers re-import the app, so refresh the shared export and point them at it
+        # instead of unpickling every model once per worker. Models that can't be
+        # exported (e.g. Gradient Boosting) are loaded by each worker instead.
+        if export_shared_models(MODEL_DIR):
+            os.environ["SHARED_MODELS"] = "1"
+            if registry.watch_interval > 0:
+                watch_shared_export(MODEL_DIR, registry.watch_interval)
+        uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run("app:app", host=args.host, port=args.port, reload=True)
@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scenario metrics where a higher value is a regression, and where a lower value is one
+REGRESSION_METRICS_HIGHER_WORSE = ['p50_ms', 'p95_ms', 'p99_ms']
+REGRESSION_METRICS_LOWER_WORSE = ['requests_per_second']
+
+
+def make_payloads(count, seed=42):
+    """Generate synthetic ForecastRequest payloads with realistic quarter-to-quarter growth"""
+    rng = np.random.default_rng(seed)
+    payloads = []
+
+    for _ in range(count):
+        revenue = rng.uniform(1e5, 5e7)
+        margin = rng.uniform(0.05, 0.4)
+        quarters = []
+        for _ in range(4):
+            revenue *= rng.uniform(0.9, 1.15)
+            expenditure = revenue * (1 - margin) * rng.uniform(0.95, 1.05)
+            quarters.append({
+                'revenue': round(revenue, 2),
+                'expenditure': round(expenditure, 2),
+                'gross_profit': round(revenue, 2) - round(expenditure, 2)
+            })
+        payloads.append({'past_quarters': quarters})
+
+    return payloads
+
+
+def summarize(latencies, wall_time):
+    """Latency percentiles in milliseconds plus throughput"""
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'max_ms': float(latencies.max()),
+        'requests_per_second': len(latencies) / wall_time if wall_time > 0 else 0.0
+    }
+
+
+async def run_load(client, payloads, model_type, concurrency):
+    """Send every payload to /forecast with a fixed number of concurrent clients"""
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < len(payloads):
+            payload = payloads[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.post(f'/forecast?model_type={model_type}', json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall_time = time.perf_counter() - start
+
+    result = summarize(latencies, wall_time)
+    result['errors'] = errors
+    return result
+
+
+async def run_benchmarks(args):
+    import httpx
+
+    # Cold start: importing the app loads every artifact and builds the fast paths
+    start = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - start
+
+    model_types = ['default'] + [
+        model_type for model_type in app.FOREST_MODEL_TYPES if not app.registry.active.unavailable_error(model_type)
+    ]
+
+    # Unique payloads per scenario so the forecast cache doesn't turn this into a cache benchmark
+    payloads = make_payloads(args.requests * (len(args.concurrency) + 1) * len(model_types) + len(model_types))
+    cursor = 0
+
+    def take(count):
+        nonlocal cursor
+        chunk = payloads[cursor:cursor + count]
+        cursor += count
+        return chunk
+
+    results = {
+        'meta': collect_metadata(args),
+        'cold': {'import_seconds': import_seconds, 'first_request_ms': {}},
+        'scenarios': {}
+    }
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        for model_type in model_types:
+            # First request per model type, before anything is warm
+            start = time.perf_counter()
+            await client.post(f'/forecast?model_type={model_type}', json=take(1)[0])
+            results['cold']['first_request_ms'][model_type] = (time.perf_counter() - start) * 1000
+
+        for model_type in model_types:
+            await run_load(client, take(args.warmup), model_type, 1)
+
+            for concurrency in args.concurrency:
+                name = f'{model_type}/c{concurrency}'
+                print(f"Running {name} ({args.requests} requests)...")
+                results['scenarios'][name] = await run_load(client, take(args.requests), model_type, concurrency)
+
+    app.inference_pool.shutdown()
+    return results
+
+
+def collect_metadata(args):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'requests_per_scenario': args.requests,
+        'warmup_requests': args.warmup,
+        'concurrency': args.concurrency
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """List every scenario metric that got worse than the baseline by more than threshold"""
+    regressions = []
+
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+
+        for metric in REGRESSION_METRICS_HIGHER_WORSE:
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], current[metric]))
+
+        for metric in REGRESSION_METRICS_LOWER_WORSE:
+            if current[metric] < previous[metric] * (1 - threshold):
+                regressions.append((name, metric, previous[metric], current[metric]))
+
+    return regressions
+
+
+def print_results(results):
+    print(f"\nCold start: import {results['cold']['import_seconds']:.2f}s")
+    for model_type, latency in results['cold']['first_request_ms'].items():
+        print(f"  first {model_type} request: {latency:.2f} ms")
+
+    print(f"\n{'Scenario':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}")
+    for name, result in results['scenarios'].items():
+        print(f"{name:<22}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['requests_per_second']:>10.1f}{result['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the forecast API in-process')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+    parser.add_argument('--warmup', type=int, default=50, help='Warm-up requests per model type')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16], help='Concurrent client counts')
+    parser.add_argument('--model-dir', help='Directory with the model artifacts (default: $MODEL_DIR or ./model)')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed relative regression (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    # The app reads its model directory at import time
+    if args.model_dir:
+        os.environ['MODEL_DIR'] = args.model_dir
+    os.environ.setdefault('MODEL_DIR', os.path.join(REPO_DIR, 'model'))
+    sys.path.insert(0, REPO_DIR)
+
+    print("Benchmarking forecast API...")
+    results = asyncio.run(run_benchmarks(args))
+    print_results(results)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions against {args.baseline} (threshold {args.threshold:.0%}):")
+            for name, metric, previous, current in regressions:
+                print(f"  {name} {metric}: {previous:.2f} -> {current:.2f}")
+            sys.exit(1)
+
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
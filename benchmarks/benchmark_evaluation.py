@@ -0,0 +1,138 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'model'))
+
+from evaluation_engine import absolute_percentage_errors, grouped_accuracy  # noqa: E402
+
+METRICS = ['Revenue', 'Expenditure', 'Gross_Profit', 'Total_Income']
+
+
+def make_dataset(n_companies, n_quarters, seed=42):
+    """Synthetic preprocessed data: one row per company and quarter with 16 lag features"""
+    rng = np.random.default_rng(seed)
+    n_rows = n_companies * n_quarters
+
+    # Each company grows from its own starting revenue with a fixed margin
+    start = rng.uniform(1e5, 5e7, n_companies)
+    margin = rng.uniform(0.05, 0.4, n_companies)
+    growth = rng.uniform(0.97, 1.06, (n_companies, n_quarters + 4)).cumprod(axis=1)
+    revenue = start[:, None] * growth
+    expenditure = revenue * (1 - margin[:, None]) * rng.uniform(0.95, 1.05, revenue.shape)
+    series = {
+        'Revenue': revenue,
+        'Expenditure': expenditure,
+        'Gross_Profit': revenue - expenditure,
+        'Total_Income': revenue * 1.02
+    }
+
+    years = 2021 + np.arange(n_quarters) // 4
+    quarters = [f'Q{quarter % 4 + 1} {year}' for quarter, year in zip(range(n_quarters), years)]
+    data = {
+        'Company_ID': pd.Categorical(np.repeat(np.arange(1, n_companies + 1), n_quarters)),
+        'Quarter': pd.Categorical(np.tile(quarters, n_companies))
+    }
+    for lag in range(1, 5):
+        for metric in METRICS:
+            data[f'{metric}_Lag{lag}'] = series[metric][:, 4 - lag:4 - lag + n_quarters].reshape(n_rows)
+    data['Revenue'] = series['Revenue'][:, 4:].reshape(n_rows)
+    data['Expenditure'] = series['Expenditure'][:, 4:].reshape(n_rows)
+
+    return pd.DataFrame(data)
+
+
+def fit_models(df, features):
+    from sklearn.linear_model import Ridge
+    sample = df.sample(min(len(df), 50000), random_state=0)
+    return [Ridge(alpha=1.0).fit(sample[features], sample[target]) for target in ['Revenue', 'Expenditure']]
+
+
+def loop_accuracy(df, features, models, group_column, groups, min_records):
+    """The per-group evaluation loop: a mask over the whole frame and two predicts per group"""
+    results = []
+    for group in groups:
+        group_data = df[df[group_column] == group]
+        if len(group_data) < min_records:
+            continue
+
+        accuracies = []
+        for target, model in zip(['Revenue', 'Expenditure'], models):
+            y = group_data[target]
+            mape = np.mean(np.abs((y - model.predict(group_data[features])) / y)) * 100
+            accuracies.append(max(0, 100 - mape))
+
+        results.append({
+            group_column: group,
+            'Revenue_Accuracy': accuracies[0],
+            'Expenditure_Accuracy': accuracies[1],
+            'Average_Accuracy': (accuracies[0] + accuracies[1]) / 2,
+            'Records': len(group_data)
+        })
+    return pd.DataFrame(results)
+
+
+def engine_accuracy(df, features, models):
+    """One predict per model over every row, then grouped aggregation per grouping"""
+    errors = {
+        target: absolute_percentage_errors(df[target], model.predict(df[features]))
+        for target, model in zip(['Revenue', 'Expenditure'], models)
+    }
+    return {
+        'company': grouped_accuracy(df, 'Company_ID', errors, min_records=5),
+        'quarter': grouped_accuracy(df, 'Quarter', errors, min_records=10, sort=True),
+        'company_quarter': grouped_accuracy(df, ['Company_ID', 'Quarter'], errors)
+    }
+
+
+def max_difference(expected, actual):
+    columns = ['Revenue_Accuracy', 'Expenditure_Accuracy', 'Average_Accuracy']
+    return float(np.abs(expected[columns].to_numpy() - actual[columns].to_numpy()).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the per-group evaluation loop against the one-pass engine')
+    parser.add_argument('--companies', type=int, default=100000, help='Synthetic companies')
+    parser.add_argument('--quarters', type=int, default=16, help='Quarters per company')
+    parser.add_argument('--loop-companies', type=int, default=500,
+                        help='Companies the loop is timed on; its full time is extrapolated (0 = run it on all)')
+    args = parser.parse_args()
+
+    print(f"Generating {args.companies} companies x {args.quarters} quarters...")
+    df = make_dataset(args.companies, args.quarters)
+    features = [col for col in df.columns if 'Lag' in col]
+    models = fit_models(df, features)
+
+    start = time.perf_counter()
+    engine_results = engine_accuracy(df, features, models)
+    engine_seconds = time.perf_counter() - start
+    print(f"Engine (company, quarter and company x quarter): {engine_seconds:.2f}s")
+
+    # Each loop iteration scans the whole frame, so its cost per company is the same for a sample
+    companies = df['Company_ID'].unique()
+    sample = companies if args.loop_companies <= 0 else companies[:args.loop_companies]
+    start = time.perf_counter()
+    loop_companies = loop_accuracy(df, features, models, 'Company_ID', sample, 5)
+    loop_company_seconds = (time.perf_counter() - start) * len(companies) / len(sample)
+
+    start = time.perf_counter()
+    loop_quarters = loop_accuracy(df, features, models, 'Quarter', sorted(df['Quarter'].unique()), 10)
+    loop_quarter_seconds = time.perf_counter() - start
+
+    loop_seconds = loop_company_seconds + loop_quarter_seconds
+    estimated = '' if len(sample) == len(companies) else f' (companies extrapolated from {len(sample)})'
+    print(f"Loop (company and quarter): {loop_seconds:.2f}s{estimated}")
+    print(f"Speedup: {loop_seconds / engine_seconds:.0f}x")
+
+    company_difference = max_difference(loop_companies, engine_results['company'].iloc[:len(loop_companies)])
+    quarter_difference = max_difference(loop_quarters, engine_results['quarter'])
+    print(f"Max accuracy difference from the loop: companies {company_difference:.2e}, quarters {quarter_difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
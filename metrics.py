@@ -0,0 +1,186 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Histogram buckets in seconds, from tens of microseconds (folded linear predict) to seconds
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Labels (endpoint, model_type) of the request being handled; stages outside a request aren't recorded
+request_labels = ContextVar("request_labels", default=None)
+
+
+class _NullTimer:
+    """Stage timer used when metrics are disabled or there is no request to attribute to"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    def __init__(self, registry, stage, labels):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe_stage(self.stage, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms rendered in Prometheus text format"""
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.help = {}
+
+    def describe(self, name, kind, help_text):
+        self.help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), amount=1):
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, labels=()):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[(name, labels)] = value
+
+    def observe(self, name, value, labels=()):
+        if not self.enabled:
+            return
+        key = (name, labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def observe_stage(self, stage, seconds, labels=None):
+        """Record one stage duration for the current (or given) request labels"""
+        labels = labels or request_labels.get()
+        if labels is None:
+            return
+        self.observe("forecast_stage_duration_seconds", seconds, labels + (("stage", stage),))
+
+    def stage(self, stage):
+        """Context manager timing a stage of the current request"""
+        if not self.enabled:
+            return NULL_TIMER
+        labels = request_labels.get()
+        if labels is None:
+            return NULL_TIMER
+        return _StageTimer(self, stage, labels)
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ""
+        escaped = (
+            (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+            for key, value in labels
+        )
+        return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self.histograms.items()}
+
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            help_kind, help_text = self.help.get(name, (kind, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {help_kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        for (name, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{self._format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests, errors and end-to-end latency per endpoint
+
+    It also stamps the request start time into the scope so handlers can attribute
+    the time spent reading and validating the body before they were called. Handlers
+    that know their model type put it in scope["metrics_model_type"] to label the request.
+    """
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope["metrics_start"] = start
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            labels = (("endpoint", endpoint), ("method", scope["method"]))
+            if "metrics_model_type" in scope:
+                labels += (("model_type", scope["metrics_model_type"]),)
+
+            self.registry.observe("http_request_duration_seconds", time.perf_counter() - start, labels)
+            self.registry.inc("http_requests_total", labels + (("status", str(status["code"])),))
+            if status["code"] >= 400:
+                self.registry.inc("http_request_errors_total", labels + (("status", str(status["code"])),))
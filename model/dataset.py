@@ -0,0 +1,117 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Columns stored as categoricals (integer codes plus a category list)
+CATEGORICAL_COLUMNS = ['Company_ID', 'Quarter']
+
+
+def columnar_dir(csv_path):
+    """Where the columnar copy of a CSV lives: a hidden directory next to it"""
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, '.columnar', os.path.splitext(name)[0])
+
+
+def source_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def compact_numeric(values):
+    """Downcast a numeric column to the smallest dtype that holds it exactly"""
+    if np.issubdtype(values.dtype, np.integer):
+        for dtype in [np.int8, np.int16, np.int32]:
+            if values.min() >= np.iinfo(dtype).min and values.max() <= np.iinfo(dtype).max:
+                return values.astype(dtype)
+        return values
+
+    # Floats only shrink when nothing is lost, so models train on the same numbers
+    if values.dtype == np.float64 and np.array_equal(values.astype(np.float32), values, equal_nan=True):
+        return values.astype(np.float32)
+    return values
+
+
+def build_columnar(csv_path, directory=None):
+    """Parse the CSV once and write one .npy file per column plus a manifest"""
+    directory = directory or columnar_dir(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    fingerprint = source_fingerprint(csv_path)
+    df = pd.read_csv(csv_path)
+
+    columns = {}
+    for index, name in enumerate(df.columns):
+        file_name = f'column_{index}.npy'
+        if name in CATEGORICAL_COLUMNS:
+            categorical = pd.Categorical(df[name])
+            values = compact_numeric(categorical.codes.astype(np.int64))
+            categories = categorical.categories
+            columns[name] = {
+                'file': file_name,
+                'categories': categories.tolist(),
+                'categories_dtype': str(categories.dtype)
+            }
+        else:
+            values = compact_numeric(df[name].to_numpy())
+            columns[name] = {'file': file_name}
+
+        path = os.path.join(directory, file_name)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, values)
+        os.replace(path + '.tmp', path)
+
+    # The manifest goes last, so a half-written directory is never mistaken for a valid one
+    manifest = {'source': fingerprint, 'rows': len(df), 'columns': columns, 'created_at': time.time()}
+    manifest_path = os.path.join(directory, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    return manifest
+
+
+def load_manifest(csv_path, directory=None):
+    """The manifest of an up-to-date columnar copy, converting the CSV first if needed"""
+    directory = directory or columnar_dir(csv_path)
+    manifest_path = os.path.join(directory, 'manifest.json')
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest['source'] == source_fingerprint(csv_path):
+            return manifest
+
+    print(f"Converting {csv_path} to a columnar cache...")
+    return build_columnar(csv_path, directory)
+
+
+def load_dataset(csv_path, columns=None, mmap=True):
+    """Load a CSV through its columnar cache
+
+    columns may be a list of names or a predicate on the name; only those columns are
+    read, memory-mapped unless mmap is False. Columns keep the CSV's order.
+    """
+    directory = columnar_dir(csv_path)
+    manifest = load_manifest(csv_path, directory)
+
+    names = list(manifest['columns'])
+    if callable(columns):
+        names = [name for name in names if columns(name)]
+    elif columns is not None:
+        missing = set(columns) - set(names)
+        if missing:
+            raise KeyError(f"Columns not in {csv_path}: {sorted(missing)}")
+        names = [name for name in names if name in columns]
+
+    data = {}
+    for name in names:
+        info = manifest['columns'][name]
+        values = np.load(os.path.join(directory, info['file']), mmap_mode='r' if mmap else None)
+        if 'categories' in info:
+            categories = pd.Index(info['categories'], dtype=info['categories_dtype'])
+            data[name] = pd.Categorical.from_codes(np.asarray(values), categories=categories)
+        else:
+            data[name] = values
+
+    return pd.DataFrame(data, copy=False)
@@ -1,27 +1,38 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, GridSearchCV, KFold, ParameterGrid, cross_val_score
+from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet, LassoCV, ElasticNetCV
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import joblib
 import os
+import argparse
+import copy
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import plotting
+from dataset import load_dataset
+from fit_cache import FitCache, hash_array
+from forest_engine import FlatForest
+from profiling import model_nbytes, profile_model
+from shared_arrays import attach_arrays, attached_arrays, share_arrays
 
 # Create model directory if it doesn't exist
 os.makedirs('../model', exist_ok=True)
 os.makedirs('../model/plots', exist_ok=True)
 
 def load_preprocessed_data():
-    """Load the preprocessed data"""
-    df = pd.read_csv('../data/preprocessed_data.csv')
+    """Load the preprocessed data (lag features, targets and company IDs only)"""
+    df = load_dataset('../data/preprocessed_data.csv',
+                      columns=lambda name: 'Lag' in name or name in ['Company_ID', 'Revenue', 'Expenditure'])
     return df
 
 def split_data(df, features, targets, test_size=0.2, random_state=42):
     """Split data into training and testing sets"""
     # Get unique company IDs
-    companies = df['Company_ID'].unique()
+    companies = np.asarray(df['Company_ID'].unique())
     
     # Split companies into train and test sets to avoid data leakage
     train_companies, test_companies = train_test_split(
@@ -48,224 +59,643 @@ def split_data(df, features, targets, test_size=0.2, random_state=42):
             X_test, y_test_revenue, y_test_expenditure,
             train_df, test_df)
 
-def train_linear_models(X_train, y_train_revenue, y_train_expenditure):
-    """Train linear regression models for revenue and expenditure prediction"""
-    models = {
-        'Linear Regression': LinearRegression(),
-        'Ridge Regression': Ridge(),
-        'Lasso Regression': Lasso(),
-        'ElasticNet': ElasticNet()
+# Fitted searches are cached here and reused while data, grids and search settings are unchanged
+FIT_CACHE_DIR = os.environ.get('FIT_CACHE_DIR', '../model/.fit_cache')
+FIT_CACHE_MAX_MB = float(os.environ.get('FIT_CACHE_MAX_MB', '1024'))
+
+# Model selection budgets; a model over any of them is only chosen if nothing fits.
+# Unset means no limit. Within the budgets, the model with the lowest single-row
+# latency whose accuracy is within SELECT_ACCURACY_TOLERANCE points of the best wins.
+SELECT_MAX_LATENCY_MS = float(os.environ['SELECT_MAX_LATENCY_MS']) if os.environ.get('SELECT_MAX_LATENCY_MS') else None
+SELECT_MAX_ARTIFACT_MB = float(os.environ['SELECT_MAX_ARTIFACT_MB']) if os.environ.get('SELECT_MAX_ARTIFACT_MB') else None
+SELECT_ACCURACY_TOLERANCE = float(os.environ.get('SELECT_ACCURACY_TOLERANCE', '0'))
+
+# Compact forests (float32, compressed) written next to the full ones; the API serves them with
+# RF_ARTIFACT=compact. A leaf limit refits the tuned forest, a tree limit keeps the first N trees.
+COMPACT_MAX_LEAF_NODES = int(os.environ.get('COMPACT_MAX_LEAF_NODES', '0')) or None
+COMPACT_TREES = int(os.environ.get('COMPACT_TREES', '0')) or None
+
+# CPU budget for training: concurrent searches times the n_jobs each search gets
+TRAIN_CPUS = int(os.environ.get('TRAIN_CPUS', os.cpu_count() or 1))
+
+# Hyperparameter grids, shared by the regularized linear models
+ALPHA_GRID = [0.001, 0.01, 0.1, 1.0, 10.0, 100.0]
+CV_FOLDS = 5
+
+# Linear models whose grid can be searched along a regularization path
+PATH_SEARCH_MODELS = ['Ridge Regression', 'Lasso Regression', 'ElasticNet']
+
+# Tree models that can be tuned with successive halving
+HALVING_SEARCH_MODELS = ['Random Forest', 'Gradient Boosting', 'Random Forest (Multi-Output)']
+
+# How regularized linear models are tuned: 'path' fits each fold's whole regularization
+# path at once, 'grid' refits every alpha from scratch with GridSearchCV
+LINEAR_SEARCH = os.environ.get('LINEAR_SEARCH', 'path')
+
+# How tree models are tuned: 'grid' is the exhaustive GridSearchCV, 'halving' successive
+# halving over training samples, stopped after TREE_SEARCH_BUDGET seconds per search (0 = no limit)
+TREE_SEARCH = os.environ.get('TREE_SEARCH', 'grid')
+TREE_SEARCH_BUDGET = float(os.environ.get('TREE_SEARCH_BUDGET', '0'))
+HALVING_FACTOR = 3
+HALVING_MIN_SAMPLES = 100
+
+def linear_model_specs():
+    """Linear estimators and the grid searched for each (None means a plain fit)"""
+    return {
+        'Linear Regression': (LinearRegression(), None),
+        'Ridge Regression': (Ridge(), {'alpha': ALPHA_GRID}),
+        'Lasso Regression': (Lasso(), {'alpha': ALPHA_GRID}),
+        'ElasticNet': (ElasticNet(), {'alpha': ALPHA_GRID, 'l1_ratio': [0.1, 0.3, 0.5, 0.7, 0.9]})
     }
+
+def tree_model_specs():
+    """Tree-based estimators and the grid searched for each"""
+    return {
+        'Random Forest': (RandomForestRegressor(random_state=42), {
+            'n_estimators': [50, 100],
+            'max_depth': [None, 10, 20],
+            'min_samples_split': [2, 5]
+        }),
+        'Gradient Boosting': (GradientBoostingRegressor(random_state=42), {
+            'n_estimators': [50, 100],
+            'learning_rate': [0.01, 0.1],
+            'max_depth': [3, 5]
+        })
+    }
+
+def ridge_path_search(X, y, alphas, cv=CV_FOLDS):
+    """Cross-validate Ridge over every alpha from a single SVD per fold
+
+    With the fold's centered training data X = U S V^T, the Ridge solution for any
+    alpha is V diag(s / (s^2 + alpha)) U^T y, so each extra alpha costs a matrix-vector
+    product instead of a full fit.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    fold_errors = np.zeros(len(alphas))
+    
+    for train_index, test_index in KFold(n_splits=cv).split(X):
+        X_mean = X[train_index].mean(axis=0)
+        y_mean = y[train_index].mean()
+        U, s, Vt = np.linalg.svd(X[train_index] - X_mean, full_matrices=False)
+        Uty = U.T @ (y[train_index] - y_mean)
+        
+        # One column of coefficients per alpha
+        coefs = Vt.T @ ((s[:, None] / (s[:, None] ** 2 + np.asarray(alphas)[None, :])) * Uty[:, None])
+        predictions = (X[test_index] - X_mean) @ coefs + y_mean
+        fold_errors += np.mean((y[test_index][:, None] - predictions) ** 2, axis=0)
     
-    trained_models = {}
-    
-    for target_name, y_train in [('Revenue', y_train_revenue), ('Expenditure', y_train_expenditure)]:
-        target_models = {}
+    # Like GridSearchCV, the first alpha wins a tie
+    return {'alpha': alphas[int(np.argmin(fold_errors))]}
+
+def linear_path_search(model_name, param_grid, X_train, y_train):
+    """Pick the best hyperparameters from regularization paths instead of one fit per grid point
+
+    Lasso and ElasticNet use sklearn's warm-started coordinate-descent paths, Ridge an
+    SVD per fold. The folds and the mean-squared-error criterion match GridSearchCV's,
+    so the selected point has the same CV error as GridSearchCV's choice within solver
+    tolerance. It isn't always the same point: the CV-path estimators scan alphas in
+    descending order and break ties their own way, and when grid points score within
+    solver noise of each other either search may land on any of them.
+    """
+    alphas = param_grid['alpha']
+    
+    if model_name == 'Ridge Regression':
+        return ridge_path_search(X_train, y_train, alphas)
+    
+    if model_name == 'Lasso Regression':
+        search = LassoCV(alphas=alphas, cv=CV_FOLDS).fit(X_train, y_train)
+        return {'alpha': float(search.alpha_)}
+    
+    search = ElasticNetCV(alphas=alphas, l1_ratio=param_grid['l1_ratio'], cv=CV_FOLDS).fit(X_train, y_train)
+    return {'alpha': float(search.alpha_), 'l1_ratio': float(search.l1_ratio_)}
+
+def successive_halving_search(estimator, param_grid, X_train, y_train, time_budget=0, n_jobs=None,
+                              factor=HALVING_FACTOR, min_samples=HALVING_MIN_SAMPLES, random_state=42):
+    """Successive halving over training samples with an optional wall-clock budget
+
+    Every configuration is cross-validated on a small random subsample, the best 1/factor
+    move on to a factor-times larger subsample, and the last round runs on the full
+    training set. If the budget runs out, the best configuration of the largest round
+    reached is used. The winner is refit on the full training set.
+    """
+    deadline = time.time() + time_budget if time_budget else None
+    candidates = list(ParameterGrid(param_grid))
+    n_samples = len(X_train)
+    n_rounds = max(1, int(np.ceil(np.log(len(candidates)) / np.log(factor))))
+    order = np.random.default_rng(random_state).permutation(n_samples)
+    
+    rounds = []
+    best_params = candidates[0]
+    best_score = None
+    budget_exhausted = False
+    
+    for round_index in range(n_rounds):
+        n_resources = n_samples // factor ** (n_rounds - 1 - round_index)
+        n_resources = min(n_samples, max(min_samples, n_resources))
+        rows = np.sort(order[:n_resources])
+        X_round = X_train.iloc[rows] if hasattr(X_train, 'iloc') else X_train[rows]
+        y_round = y_train[rows]
         
-        for model_name, model in models.items():
-            print(f"Training {model_name} for {target_name}...")
-            
-            # For regularized models, perform grid search to find best parameters
-            if model_name != 'Linear Regression':
-                param_grid = {'alpha': [0.001, 0.01, 0.1, 1.0, 10.0, 100.0]}
-                if model_name == 'ElasticNet':
-                    param_grid['l1_ratio'] = [0.1, 0.3, 0.5, 0.7, 0.9]
-                
-                grid_search = GridSearchCV(model, param_grid, cv=5, scoring='neg_mean_squared_error')
-                grid_search.fit(X_train, y_train)
-                
-                best_model = grid_search.best_estimator_
-                print(f"Best parameters for {model_name}: {grid_search.best_params_}")
-                target_models[model_name] = best_model
-            else:
-                model.fit(X_train, y_train)
-                target_models[model_name] = model
+        round_start = time.time()
+        scores = []
+        for params in candidates:
+            if deadline is not None and time.time() > deadline:
+                budget_exhausted = True
+                break
+            model = clone(estimator).set_params(**params)
+            score = cross_val_score(model, X_round, y_round, cv=CV_FOLDS, scoring='neg_mean_squared_error', n_jobs=n_jobs)
+            scores.append(score.mean())
+        
+        if scores:
+            # Candidates scored in this round share the same resources, so they're comparable
+            ranking = np.argsort(scores)[::-1]
+            best_params = candidates[ranking[0]]
+            best_score = scores[ranking[0]]
+            candidates = [candidates[i] for i in ranking[:int(np.ceil(len(candidates) / factor))]]
+            rounds.append({
+                'samples': n_resources,
+                'candidates': len(scores),
+                'seconds': time.time() - round_start
+            })
         
-        trained_models[target_name] = target_models
+        if budget_exhausted:
+            break
     
-    return trained_models
+    best_model = clone(estimator).set_params(**best_params).fit(X_train, y_train)
+    return best_model, best_params, {'rounds': rounds, 'budget_exhausted': budget_exhausted, 'best_score': best_score}
 
-def train_tree_models(X_train, y_train_revenue, y_train_expenditure):
-    """Train tree-based models for revenue and expenditure prediction"""
-    models = {
-        'Random Forest': RandomForestRegressor(random_state=42),
-        'Gradient Boosting': GradientBoostingRegressor(random_state=42)
+def multi_output_model_specs():
+    """Joint estimator predicting [Revenue, Expenditure] in one pass, with its grid"""
+    return {
+        'Random Forest (Multi-Output)': (RandomForestRegressor(random_state=42), {
+            'n_estimators': [50, 100],
+            'max_depth': [None, 10, 20],
+            'min_samples_split': [2, 5]
+        })
     }
-    
-    trained_models = {}
-    # Store individual RF models for separate saving
-    rf_models = {}
-    
-    for target_name, y_train in [('Revenue', y_train_revenue), ('Expenditure', y_train_expenditure)]:
-        target_models = {}
+
+def make_training_tasks(specs, target_names=('Revenue', 'Expenditure')):
+    """One independent (target, model) search per task"""
+    return [
+        (target_name, model_name, estimator, param_grid)
+        for target_name in target_names
+        for model_name, (estimator, param_grid) in specs.items()
+    ]
+
+def estimate_task_cost(task):
+    """Rough relative cost of a task: number of fits times trees per fit"""
+    _, _, estimator, param_grid = task
+    if param_grid is None:
+        return 1
+    
+    fits = CV_FOLDS * np.prod([len(values) for values in param_grid.values()])
+    trees = np.mean(param_grid.get('n_estimators', [getattr(estimator, 'n_estimators', 1)]))
+    return fits * trees
+
+def default_search_options():
+    return {'linear': LINEAR_SEARCH, 'tree': TREE_SEARCH, 'tree_budget': TREE_SEARCH_BUDGET}
+
+def _run_training_task(task, n_jobs, search_options):
+    target_name, model_name, estimator, param_grid = task
+    shared = attached_arrays()
+    # Keep the column names so the fitted models record feature_names_in_
+    X_train = pd.DataFrame(shared['X'], columns=shared['columns'], copy=False)
+    y_train = shared[target_name]
+    start = time.time()
+    
+    # Mean CV score (negative MSE) of the chosen parameters, where the search computes one
+    best_score = None
+    
+    if param_grid is None:
+        best_model = clone(estimator).fit(X_train, y_train)
+        best_params = None
+    elif search_options['linear'] == 'path' and model_name in PATH_SEARCH_MODELS:
+        # Refit on the full training set with the selected parameters, as GridSearchCV does
+        best_params = linear_path_search(model_name, param_grid, X_train, y_train)
+        best_model = clone(estimator).set_params(**best_params).fit(X_train, y_train)
+    elif search_options['tree'] == 'halving' and model_name in HALVING_SEARCH_MODELS:
+        best_model, best_params, halving_info = successive_halving_search(
+            estimator, param_grid, X_train, y_train, time_budget=search_options['tree_budget'], n_jobs=n_jobs
+        )
+        best_score = halving_info['best_score']
+    else:
+        grid_search = GridSearchCV(estimator, param_grid, cv=CV_FOLDS, scoring='neg_mean_squared_error', n_jobs=n_jobs)
+        grid_search.fit(X_train, y_train)
+        best_model = grid_search.best_estimator_
+        best_params = grid_search.best_params_
+        best_score = grid_search.best_score_
+    
+    return {
+        'target': target_name,
+        'model': model_name,
+        'best_model': best_model,
+        'best_params': best_params,
+        'best_score': best_score,
+        'start': start,
+        'end': time.time(),
+        'pid': os.getpid(),
+        'cached': False
+    }
+
+def task_search_config(task, search_options):
+    """The settings of the search a task will actually run, for the fit cache key"""
+    _, model_name, _, param_grid = task
+    if param_grid is None:
+        return {'search': 'fit'}
+    if search_options['linear'] == 'path' and model_name in PATH_SEARCH_MODELS:
+        return {'search': 'path', 'cv': CV_FOLDS}
+    if search_options['tree'] == 'halving' and model_name in HALVING_SEARCH_MODELS:
+        return {'search': 'halving', 'cv': CV_FOLDS, 'factor': HALVING_FACTOR,
+                'min_samples': HALVING_MIN_SAMPLES, 'budget': search_options['tree_budget']}
+    return {'search': 'grid', 'cv': CV_FOLDS, 'scoring': 'neg_mean_squared_error'}
+
+def print_training_timeline(records, started, width=40):
+    """Print when each fit ran, relative to the start of training"""
+    total = max(record['end'] for record in records) - started
+    print(f"\nTraining timeline ({total:.1f}s total):")
+    
+    for record in sorted(records, key=lambda r: r['start']):
+        start = record['start'] - started
+        end = record['end'] - started
+        first = int(start / total * width) if total > 0 else 0
+        last = max(first + 1, int(end / total * width)) if total > 0 else width
+        bar = ' ' * first + '#' * (last - first)
+        label = f"{record['target']} - {record['model']}" + (" (cached)" if record['cached'] else "")
+        print(f"  {label:<48} {start:7.1f}s -> {end:7.1f}s  pid {record['pid']:<7} |{bar:<{width}}|")
+
+def run_training_schedule(tasks, X_train, y_trains, cpus=None, search_options=None, fit_cache=None):
+    """Run independent searches concurrently in a process pool within a CPU budget
+
+    The most expensive searches are started first so the long Random Forest grids don't
+    end up running alone at the end. Each search gets an equal share of the budget as
+    GridSearchCV n_jobs. Searches found in fit_cache are loaded instead of run.
+    
+    Returns the trained models and the seconds each search took (as first measured,
+    for models loaded from the cache), both keyed by target and then model name.
+    """
+    cpus = max(1, cpus or TRAIN_CPUS)
+    search_options = search_options or default_search_options()
+    records = []
+    started = time.time()
+    
+    def report(record):
+        records.append(record)
+        if record['cached']:
+            print(f"Loaded {record['model']} for {record['target']} from the fit cache")
+        else:
+            print(f"Trained {record['model']} for {record['target']} in {record['end'] - record['start']:.1f}s")
+        if record['best_params'] is not None:
+            print(f"Best parameters for {record['model']}: {record['best_params']}")
+    
+    cache_keys = {}
+    pending_tasks = tasks
+    if fit_cache is not None:
+        x_hash = hash_array(X_train)
+        data_hashes = {target_name: x_hash + hash_array(y_train) for target_name, y_train in y_trains.items()}
+        pending_tasks = []
         
-        for model_name, model in models.items():
-            print(f"Training {model_name} for {target_name}...")
-            
-            # Define parameter grid for grid search
-            if model_name == 'Random Forest':
-                param_grid = {
-                    'n_estimators': [50, 100],
-                    'max_depth': [None, 10, 20],
-                    'min_samples_split': [2, 5]
-                }
-            else:  # Gradient Boosting
-                param_grid = {
-                    'n_estimators': [50, 100],
-                    'learning_rate': [0.01, 0.1],
-                    'max_depth': [3, 5]
-                }
+        for task in tasks:
+            target_name, model_name, estimator, param_grid = task
+            key = fit_cache.make_key(data_hashes[target_name], X_train.columns, estimator, param_grid,
+                                     task_search_config(task, search_options))
+            entry = fit_cache.get(key)
+            if entry is None:
+                cache_keys[(target_name, model_name)] = key
+                pending_tasks.append(task)
+            else:
+                now = time.time()
+                report(dict(entry, target=target_name, model=model_name, start=now, end=now, pid=os.getpid(), cached=True))
+    
+    if pending_tasks:
+        run_searches(pending_tasks, X_train, y_trains, cpus, search_options, report)
+    
+    if fit_cache is not None:
+        for record in records:
+            if not record['cached']:
+                fit_cache.put(cache_keys[(record['target'], record['model'])], {
+                    'best_model': record['best_model'],
+                    'best_params': record['best_params'],
+                    'best_score': record['best_score'],
+                    'fit_seconds': record['end'] - record['start']
+                })
+        removed = fit_cache.evict()
+        stats = fit_cache.stats()
+        print(f"Fit cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries "
+              f"({stats['bytes'] / 1e6:.1f} MB){f', evicted {removed}' if removed else ''}")
+    
+    print_training_timeline(records, started)
+    
+    # Assemble in task order so model ordering (and tie-breaking on accuracy) is unchanged
+    records = {(record['target'], record['model']): record for record in records}
+    trained_models = {}
+    search_seconds = {}
+    for target_name, model_name, _, _ in tasks:
+        record = records[(target_name, model_name)]
+        trained_models.setdefault(target_name, {})[model_name] = record['best_model']
+        search_seconds.setdefault(target_name, {})[model_name] = (
+            record['fit_seconds'] if record['cached'] else record['end'] - record['start']
+        )
+    
+    return trained_models, search_seconds
+
+def run_searches(tasks, X_train, y_trains, cpus, search_options, report):
+    """Run tasks in a process pool sized to the CPU budget, passing each result to report"""
+    workers = min(cpus, len(tasks))
+    n_jobs = max(1, cpus // workers)
+    ordered_tasks = sorted(tasks, key=estimate_task_cost, reverse=True)
+    
+    print(f"Running {len(tasks)} searches on {cpus} CPUs ({workers} concurrent, n_jobs={n_jobs} each)...")
+    
+    # The training data is dumped once and memory-mapped by every worker
+    with share_arrays({'X': X_train.to_numpy(), **y_trains}) as paths:
+        values = {'columns': list(X_train.columns)}
+        if workers == 1:
+            attach_arrays(paths, values)
+            for task in ordered_tasks:
+                report(_run_training_task(task, n_jobs, search_options))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach_arrays,
+                                     initargs=(paths, values)) as executor:
+                futures = [executor.submit(_run_training_task, task, n_jobs, search_options) for task in ordered_tasks]
+                for future in as_completed(futures):
+                    report(future.result())
+
+def compare_linear_searches(X_train, y_trains):
+    """Time the path search against GridSearchCV for every regularized linear model and target"""
+    comparison = []
+    
+    for target_name, y_train in y_trains.items():
+        for model_name, (estimator, param_grid) in linear_model_specs().items():
+            if model_name not in PATH_SEARCH_MODELS:
+                continue
             
-            # Perform grid search
-            grid_search = GridSearchCV(model, param_grid, cv=5, scoring='neg_mean_squared_error')
+            start = time.perf_counter()
+            grid_search = GridSearchCV(estimator, param_grid, cv=CV_FOLDS, scoring='neg_mean_squared_error')
             grid_search.fit(X_train, y_train)
+            grid_seconds = time.perf_counter() - start
             
-            best_model = grid_search.best_estimator_
-            print(f"Best parameters for {model_name}: {grid_search.best_params_}")
-            target_models[model_name] = best_model
+            start = time.perf_counter()
+            path_params = linear_path_search(model_name, param_grid, X_train, y_train)
+            path_seconds = time.perf_counter() - start
             
-            # Store RF models separately
-            if model_name == 'Random Forest':
-                rf_models[target_name] = best_model
-        
-        trained_models[target_name] = target_models
+            # GridSearchCV's own CV error for the path's choice; when the two searches pick
+            # different parameters this shows how far apart they really are
+            grid_mse = -grid_search.best_score_
+            path_mse = next(
+                -score for params, score in zip(grid_search.cv_results_['params'], grid_search.cv_results_['mean_test_score'])
+                if all(np.isclose(params[key], value) for key, value in path_params.items())
+            )
+            
+            comparison.append({
+                'Target': target_name,
+                'Model': model_name,
+                'Grid_Seconds': grid_seconds,
+                'Path_Seconds': path_seconds,
+                'Speedup': grid_seconds / path_seconds if path_seconds > 0 else float('inf'),
+                'Grid_Params': grid_search.best_params_,
+                'Path_Params': path_params,
+                'Same_Params': all(np.isclose(grid_search.best_params_[key], value) for key, value in path_params.items()),
+                'CV_MSE_Gap_Pct': (path_mse - grid_mse) / grid_mse * 100
+            })
+            
+            print(f"{target_name} - {model_name}: grid {grid_seconds:.2f}s, path {path_seconds:.2f}s "
+                  f"({comparison[-1]['Speedup']:.1f}x), same parameters: {comparison[-1]['Same_Params']}, "
+                  f"CV MSE gap: {comparison[-1]['CV_MSE_Gap_Pct']:.4f}%")
+    
+    comparison_df = pd.DataFrame(comparison)
+    comparison_df.to_csv('../model/linear_search_comparison.csv', index=False)
+    print("Linear search comparison saved to model/linear_search_comparison.csv")
     
-    return trained_models, rf_models
+    return comparison_df
+
+def regression_metrics(y_test, y_pred):
+    """Error metrics and accuracy (100 - MAPE, floored at 0) for one target"""
+    mse = mean_squared_error(y_test, y_pred)
+    
+    # Calculate MAPE (Mean Absolute Percentage Error)
+    mape = np.mean(np.abs((y_test - y_pred) / y_test)) * 100
+    
+    return {
+        'MSE': mse,
+        'RMSE': np.sqrt(mse),
+        'MAE': mean_absolute_error(y_test, y_pred),
+        'R2': r2_score(y_test, y_pred),
+        'MAPE': mape,
+        'Accuracy': max(0, 100 - mape)
+    }
+
+def print_metrics(target_name, model_name, model_results):
+    print(f"{target_name} - {model_name}:")
+    print(f"  RMSE: {model_results['RMSE']:.2f}")
+    print(f"  MAE: {model_results['MAE']:.2f}")
+    print(f"  R2: {model_results['R2']:.4f}")
+    print(f"  Accuracy: {model_results['Accuracy']:.2f}%")
 
 def evaluate_models(models, X_test, y_test_revenue, y_test_expenditure):
-    """Evaluate trained models on test data"""
+    """Evaluate trained models on test data; returns the metrics and the test predictions"""
     results = {}
+    predictions = {}
     
     for target_name, target_models in models.items():
         y_test = y_test_revenue if target_name == 'Revenue' else y_test_expenditure
         target_results = {}
+        predictions[target_name] = {}
         
         for model_name, model in target_models.items():
-            # Make predictions
             y_pred = model.predict(X_test)
+            predictions[target_name][model_name] = y_pred
+            model_results = regression_metrics(y_test, y_pred)
+            target_results[model_name] = model_results
+            print_metrics(target_name, model_name, model_results)
+        
+        results[target_name] = target_results
+    
+    return results, predictions
+
+def compare_tree_searches(X_train, y_trains, X_test, y_tests, time_budget=0):
+    """Compare successive halving with the exhaustive grid: chosen parameters, test accuracy and runtime"""
+    comparison = []
+    
+    for target_name, y_train in y_trains.items():
+        y_train = np.asarray(y_train)
+        
+        for model_name, (estimator, param_grid) in tree_model_specs().items():
+            start = time.perf_counter()
+            grid_search = GridSearchCV(estimator, param_grid, cv=CV_FOLDS, scoring='neg_mean_squared_error')
+            grid_search.fit(X_train, y_train)
+            grid_seconds = time.perf_counter() - start
             
-            # Calculate metrics
-            mse = mean_squared_error(y_test, y_pred)
-            rmse = np.sqrt(mse)
-            mae = mean_absolute_error(y_test, y_pred)
-            r2 = r2_score(y_test, y_pred)
-            
-            # Calculate MAPE (Mean Absolute Percentage Error)
-            mape = np.mean(np.abs((y_test - y_pred) / y_test)) * 100
-            
-            # Calculate accuracy as 100 - MAPE (capped at 0 if MAPE > 100)
-            accuracy = max(0, 100 - mape)
+            start = time.perf_counter()
+            halving_model, halving_params, halving_info = successive_halving_search(
+                estimator, param_grid, X_train, y_train, time_budget=time_budget
+            )
+            halving_seconds = time.perf_counter() - start
             
-            # Store results
-            model_results = {
-                'MSE': mse,
-                'RMSE': rmse,
-                'MAE': mae,
-                'R2': r2,
-                'MAPE': mape,
-                'Accuracy': accuracy
-            }
+            grid_accuracy = regression_metrics(y_tests[target_name], grid_search.best_estimator_.predict(X_test))['Accuracy']
+            halving_accuracy = regression_metrics(y_tests[target_name], halving_model.predict(X_test))['Accuracy']
             
-            target_results[model_name] = model_results
+            comparison.append({
+                'Target': target_name,
+                'Model': model_name,
+                'Grid_Params': grid_search.best_params_,
+                'Halving_Params': halving_params,
+                'Grid_Accuracy': grid_accuracy,
+                'Halving_Accuracy': halving_accuracy,
+                'Grid_Seconds': grid_seconds,
+                'Halving_Seconds': halving_seconds,
+                'Speedup': grid_seconds / halving_seconds if halving_seconds > 0 else float('inf'),
+                'Halving_Rounds': len(halving_info['rounds']),
+                'Budget_Exhausted': halving_info['budget_exhausted']
+            })
             
             print(f"{target_name} - {model_name}:")
-            print(f"  RMSE: {rmse:.2f}")
-            print(f"  MAE: {mae:.2f}")
-            print(f"  R2: {r2:.4f}")
-            print(f"  Accuracy: {accuracy:.2f}%")
-        
-        results[target_name] = target_results
+            print(f"  Grid:    {grid_search.best_params_} accuracy {grid_accuracy:.2f}% in {grid_seconds:.1f}s")
+            print(f"  Halving: {halving_params} accuracy {halving_accuracy:.2f}% in {halving_seconds:.1f}s "
+                  f"({comparison[-1]['Speedup']:.1f}x)")
+    
+    comparison_df = pd.DataFrame(comparison)
+    comparison_df.to_csv('../model/tree_search_comparison.csv', index=False)
+    print("Tree search comparison saved to model/tree_search_comparison.csv")
+    
+    return comparison_df
+
+def evaluate_multi_output_model(model, model_name, X_test, y_test_revenue, y_test_expenditure):
+    """Evaluate a joint model on both targets from a single predict call"""
+    y_pred = model.predict(X_test)
+    results = {}
+    
+    for column, (target_name, y_test) in enumerate([('Revenue', y_test_revenue), ('Expenditure', y_test_expenditure)]):
+        results[target_name] = regression_metrics(y_test, y_pred[:, column])
+        print_metrics(target_name, model_name, results[target_name])
     
     return results
 
-def visualize_results(results, train_df, test_df, models, X_test, y_test_revenue, y_test_expenditure):
-    """Visualize model evaluation results"""
-    
-    # Create bar chart of model accuracies
-    plt.figure(figsize=(12, 6))
-    
-    # Plot Revenue model accuracies
-    revenue_accuracies = [results['Revenue'][model]['Accuracy'] for model in results['Revenue']]
-    expenditure_accuracies = [results['Expenditure'][model]['Accuracy'] for model in results['Expenditure']]
-    
-    x = np.arange(len(results['Revenue']))
-    width = 0.35
-    
-    plt.bar(x - width/2, revenue_accuracies, width, label='Revenue')
-    plt.bar(x + width/2, expenditure_accuracies, width, label='Expenditure')
-    
-    plt.xlabel('Model')
-    plt.ylabel('Accuracy (%)')
-    plt.title('Model Accuracy Comparison')
-    plt.xticks(x, list(results['Revenue'].keys()), rotation=45)
-    plt.axhline(y=70, color='r', linestyle='--', label='Target Accuracy (70%)')
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig('../model/plots/model_accuracy_comparison.png')
-    
-    # Create scatter plots of actual vs predicted values for the best models
-    # Find best model for each target
-    best_revenue_model = max(results['Revenue'].items(), key=lambda x: x[1]['Accuracy'])
-    best_expenditure_model = max(results['Expenditure'].items(), key=lambda x: x[1]['Accuracy'])
-    
-    print(f"Best model for Revenue: {best_revenue_model[0]} with accuracy {best_revenue_model[1]['Accuracy']:.2f}%")
-    print(f"Best model for Expenditure: {best_expenditure_model[0]} with accuracy {best_expenditure_model[1]['Accuracy']:.2f}%")
-    
-    # Plot actual vs predicted for best Revenue model
-    plt.figure(figsize=(10, 6))
-    y_pred_revenue = models['Revenue'][best_revenue_model[0]].predict(X_test)
-    plt.scatter(y_test_revenue, y_pred_revenue, alpha=0.5)
-    plt.plot([y_test_revenue.min(), y_test_revenue.max()], [y_test_revenue.min(), y_test_revenue.max()], 'r--')
-    plt.xlabel('Actual Revenue')
-    plt.ylabel('Predicted Revenue')
-    plt.title(f'Actual vs Predicted Revenue ({best_revenue_model[0]})')
-    plt.grid(True)
-    plt.savefig('../model/plots/revenue_actual_vs_predicted.png')
-    
-    # Plot actual vs predicted for best Expenditure model
-    plt.figure(figsize=(10, 6))
-    y_pred_expenditure = models['Expenditure'][best_expenditure_model[0]].predict(X_test)
-    plt.scatter(y_test_expenditure, y_pred_expenditure, alpha=0.5)
-    plt.plot([y_test_expenditure.min(), y_test_expenditure.max()], [y_test_expenditure.min(), y_test_expenditure.max()], 'r--')
-    plt.xlabel('Actual Expenditure')
-    plt.ylabel('Predicted Expenditure')
-    plt.title(f'Actual vs Predicted Expenditure ({best_expenditure_model[0]})')
-    plt.grid(True)
-    plt.savefig('../model/plots/expenditure_actual_vs_predicted.png')
-    
-    # Plot feature importance for tree-based models
-    if best_revenue_model[0] in ['Random Forest', 'Gradient Boosting']:
-        plt.figure(figsize=(12, 6))
-        feature_importances = models['Revenue'][best_revenue_model[0]].feature_importances_
-        features = X_test.columns
-        indices = np.argsort(feature_importances)[::-1]
-        
-        plt.bar(range(len(feature_importances)), feature_importances[indices])
-        plt.xticks(range(len(feature_importances)), [features[i] for i in indices], rotation=90)
-        plt.xlabel('Features')
-        plt.ylabel('Importance')
-        plt.title(f'Feature Importance for Revenue Prediction ({best_revenue_model[0]})')
-        plt.tight_layout()
-        plt.savefig('../model/plots/revenue_feature_importance.png')
-    
-    if best_expenditure_model[0] in ['Random Forest', 'Gradient Boosting']:
-        plt.figure(figsize=(12, 6))
-        feature_importances = models['Expenditure'][best_expenditure_model[0]].feature_importances_
-        features = X_test.columns
-        indices = np.argsort(feature_importances)[::-1]
-        
-        plt.bar(range(len(feature_importances)), feature_importances[indices])
-        plt.xticks(range(len(feature_importances)), [features[i] for i in indices], rotation=90)
-        plt.xlabel('Features')
-        plt.ylabel('Importance')
-        plt.title(f'Feature Importance for Expenditure Prediction ({best_expenditure_model[0]})')
-        plt.tight_layout()
-        plt.savefig('../model/plots/expenditure_feature_importance.png')
+def profile_models(models, X_train, y_trains, X_test, search_seconds=None, refit=False):
+    """Profile every trained model's search time, latency, memory and artifact size
+
+    search_seconds (by target and model name) is how long the scheduler's search took;
+    with refit each chosen configuration is also fit once more to time a single fit.
+    """
+    profiles = {}
     
-    # Close all plots
-    plt.close('all')
+    for target_name, target_models in models.items():
+        profiles[target_name] = {}
+        for model_name, model in target_models.items():
+            seconds = None if search_seconds is None else search_seconds[target_name][model_name]
+            profile = profile_model(model, X_train, y_trains[target_name], X_test, search_seconds=seconds, refit=refit)
+            profiles[target_name][model_name] = profile
+            timing = [f"{label} {profile[key]:.2f}s" for label, key in [('search', 'Search_Seconds'), ('fit', 'Fit_Seconds')]
+                      if profile[key] is not None]
+            print(f"{target_name} - {model_name}: {', '.join(timing + [''])}"
+                  f"1 row {profile['Single_Row_ms']:.2f} ms, {profile['Batch_Rows']} rows {profile['Batch_ms']:.1f} ms, "
+                  f"predict peak {profile['Predict_Peak_MB']:.2f} MB, in memory {profile['Model_MB']:.2f} MB, "
+                  f"artifact {profile['Artifact_MB']:.2f} MB")
+    
+    return profiles
+
+def select_model(target_results, target_profiles=None, max_latency_ms=None, max_artifact_mb=None,
+                 accuracy_tolerance=0.0):
+    """Choose a model for one target under the latency and size budgets
+
+    Returns the model name and why it was chosen. Without profiles or budgets this is
+    simply the most accurate model.
+    """
+    def within_budget(model_name):
+        if target_profiles is None:
+            return True
+        profile = target_profiles[model_name]
+        return ((max_latency_ms is None or profile['Single_Row_ms'] <= max_latency_ms) and
+                (max_artifact_mb is None or profile['Artifact_MB'] <= max_artifact_mb))
+    
+    candidates = [model_name for model_name in target_results if within_budget(model_name)]
+    has_budget = target_profiles is not None and (max_latency_ms is not None or max_artifact_mb is not None)
+    reason = 'most accurate within budget' if has_budget else 'most accurate'
+    if not candidates:
+        candidates = list(target_results)
+        reason = 'no model within budget, most accurate overall'
+    
+    best_accuracy = max(target_results[model_name]['Accuracy'] for model_name in candidates)
+    if target_profiles is None or accuracy_tolerance <= 0:
+        chosen = next(model_name for model_name in candidates if target_results[model_name]['Accuracy'] == best_accuracy)
+        return chosen, reason
+    
+    # Trade up to accuracy_tolerance points of accuracy for the fastest model
+    close_enough = [model_name for model_name in candidates
+                    if target_results[model_name]['Accuracy'] >= best_accuracy - accuracy_tolerance]
+    chosen = min(close_enough, key=lambda model_name: target_profiles[model_name]['Single_Row_ms'])
+    if target_results[chosen]['Accuracy'] < best_accuracy:
+        reason = f'fastest within {accuracy_tolerance:g} points of the best accuracy'
+    return chosen, reason
+
+def select_best_models(results, profiles=None, max_latency_ms=None, max_artifact_mb=None, accuracy_tolerance=0.0):
+    """Pick the model to ship for each target"""
+    chosen = {}
+    
+    for target_name in ['Revenue', 'Expenditure']:
+        model_name, reason = select_model(
+            results[target_name], profiles and profiles[target_name],
+            max_latency_ms, max_artifact_mb, accuracy_tolerance
+        )
+        chosen[target_name] = {'model': model_name, 'reason': reason}
+        print(f"Best model for {target_name}: {model_name} with accuracy "
+              f"{results[target_name][model_name]['Accuracy']:.2f}% ({reason})")
+    
+    return chosen['Revenue']['model'], chosen['Expenditure']['model'], chosen
+
+def save_selection_report(results, profiles, chosen, budgets, path='../model/model_selection_report.json'):
+    """Write accuracy and cost of every candidate, the budgets and the chosen models as JSON"""
+    report = {
+        'budgets': budgets,
+        'selected': chosen,
+        'candidates': {
+            target_name: {
+                model_name: {**results[target_name][model_name], **target_profiles[model_name]}
+                for model_name in target_profiles
+            }
+            for target_name, target_profiles in profiles.items()
+        }
+    }
     
-    return best_revenue_model[0], best_expenditure_model[0]
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=float)
+    print(f"Model selection report saved to {path.replace('../', '')}")
+
+def visualize_results(results, predictions, models, best_model_names, feature_names,
+                      y_test_revenue, y_test_expenditure, workers=None):
+    """Visualize model evaluation results, reusing the test predictions from evaluate_models"""
+    jobs = [(plotting.plot_accuracy_comparison, {
+        'path': '../model/plots/model_accuracy_comparison.png',
+        'model_names': list(results['Revenue'].keys()),
+        'revenue_accuracies': [results['Revenue'][model]['Accuracy'] for model in results['Revenue']],
+        'expenditure_accuracies': [results['Expenditure'][model]['Accuracy'] for model in results['Expenditure']]
+    })]
+    
+    for target_name, y_test in [('Revenue', y_test_revenue), ('Expenditure', y_test_expenditure)]:
+        model_name = best_model_names[target_name]
+        
+        # Plot actual vs predicted for the best model
+        jobs.append((plotting.plot_actual_vs_predicted, {
+            'path': f'../model/plots/{target_name.lower()}_actual_vs_predicted.png',
+            'actual': np.asarray(y_test),
+            'predicted': predictions[target_name][model_name],
+            'target_label': target_name,
+            'model_name': model_name
+        }))
+        
+        # Plot feature importance for tree-based models
+        if model_name in ['Random Forest', 'Gradient Boosting']:
+            jobs.append((plotting.plot_feature_importance, {
+                'path': f'../model/plots/{target_name.lower()}_feature_importance.png',
+                'feature_names': list(feature_names),
+                'feature_importances': models[target_name][model_name].feature_importances_,
+                'target_label': target_name,
+                'model_name': model_name
+            }))
+    
+    start = time.perf_counter()
+    rendered = plotting.render_figures(jobs, workers)
+    print(f"Rendered {len(rendered)} plots in {time.perf_counter() - start:.2f}s")
 
 def save_best_models(models, best_revenue_model_name, best_expenditure_model_name):
     """Save the best models for deployment"""
@@ -280,7 +710,119 @@ def save_best_models(models, best_revenue_model_name, best_expenditure_model_nam
     print(f"  Revenue: {best_revenue_model_name}")
     print(f"  Expenditure: {best_expenditure_model_name}")
 
+def compact_forest(forest, X_train, y_train, max_leaf_nodes=None, n_trees=None):
+    """Shrink a fitted forest for serving and flatten it to float32 arrays"""
+    if max_leaf_nodes:
+        forest = clone(forest).set_params(max_leaf_nodes=max_leaf_nodes).fit(X_train, y_train)
+    
+    # Trees of a bagged forest are exchangeable, so the first n_trees are a fair subsample
+    if n_trees and n_trees < len(forest.estimators_):
+        forest = copy.copy(forest)
+        forest.estimators_ = forest.estimators_[:n_trees]
+        forest.n_estimators = n_trees
+    
+    return FlatForest.from_sklearn(forest).compact()
+
+def best_time(function, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def compact_forests(forests, X_train, X_test, max_leaf_nodes=None, n_trees=None):
+    """Write a compact artifact for each saved forest and compare it with the full one
+
+    forests maps a name to (forest, y_train, {target: y_test}, full path, compact path).
+    The full variant is timed as the API serves it: unpickled, then flattened into an engine.
+    """
+    comparison = []
+    X_test_array = X_test.to_numpy()
+    row = X_test_array[:1]
+    
+    for name, (forest, y_train, y_tests, full_path, compact_path) in forests.items():
+        compact = compact_forest(forest, X_train, y_train, max_leaf_nodes, n_trees)
+        compact.save_compressed(compact_path)
+        full = FlatForest.from_sklearn(forest)
+        
+        full_load = best_time(lambda: FlatForest.from_sklearn(joblib.load(full_path)))
+        compact_load = best_time(lambda: FlatForest.load_compressed(compact_path))
+        full_row = best_time(lambda: full.predict(row), repeats=50)
+        compact_row = best_time(lambda: compact.predict(row), repeats=50)
+        
+        full_predictions = full.predict(X_test_array).reshape(len(X_test_array), -1)
+        compact_predictions = compact.predict(X_test_array).reshape(len(X_test_array), -1)
+        
+        for column, (target_name, y_test) in enumerate(y_tests.items()):
+            full_accuracy = regression_metrics(y_test, full_predictions[:, column])['Accuracy']
+            compact_accuracy = regression_metrics(y_test, compact_predictions[:, column])['Accuracy']
+            comparison.append({
+                'Forest': name,
+                'Target': target_name,
+                'Full_Accuracy': full_accuracy,
+                'Compact_Accuracy': compact_accuracy,
+                'Accuracy_Change': compact_accuracy - full_accuracy,
+                'Full_Nodes': full.n_nodes,
+                'Compact_Nodes': compact.n_nodes,
+                'Full_Artifact_MB': os.path.getsize(full_path) / 1e6,
+                'Compact_Artifact_MB': os.path.getsize(compact_path) / 1e6,
+                'Full_Memory_MB': (model_nbytes(forest) + full.nbytes) / 1e6,
+                'Compact_Memory_MB': compact.nbytes / 1e6,
+                'Full_Load_ms': full_load * 1000,
+                'Compact_Load_ms': compact_load * 1000,
+                'Full_Row_ms': full_row * 1000,
+                'Compact_Row_ms': compact_row * 1000
+            })
+            
+            result = comparison[-1]
+            print(f"{name} - {target_name}: accuracy {result['Full_Accuracy']:.2f}% -> {result['Compact_Accuracy']:.2f}% "
+                  f"({result['Accuracy_Change']:+.3f}), artifact {result['Full_Artifact_MB']:.2f} -> "
+                  f"{result['Compact_Artifact_MB']:.2f} MB, memory {result['Full_Memory_MB']:.2f} -> "
+                  f"{result['Compact_Memory_MB']:.2f} MB, load {result['Full_Load_ms']:.1f} -> "
+                  f"{result['Compact_Load_ms']:.1f} ms, 1 row {result['Full_Row_ms']:.3f} -> {result['Compact_Row_ms']:.3f} ms")
+    
+    comparison_df = pd.DataFrame(comparison)
+    comparison_df.to_csv('../model/forest_compaction_report.csv', index=False)
+    print("Forest compaction report saved to model/forest_compaction_report.csv")
+    
+    return comparison_df
+
 def main():
+    parser = argparse.ArgumentParser(description='Train and select the budget forecasting models')
+    parser.add_argument('--cpus', type=int, default=TRAIN_CPUS, help='CPU budget for training (default: $TRAIN_CPUS or all cores)')
+    parser.add_argument('--linear-search', choices=['path', 'grid'], default=LINEAR_SEARCH,
+                        help='Tune Ridge/Lasso/ElasticNet with regularization paths or GridSearchCV')
+    parser.add_argument('--compare-linear-search', action='store_true',
+                        help='Time the path search against GridSearchCV and save the comparison')
+    parser.add_argument('--tree-search', choices=['grid', 'halving'], default=TREE_SEARCH,
+                        help='Tune the tree models exhaustively or with successive halving')
+    parser.add_argument('--tree-budget', type=float, default=TREE_SEARCH_BUDGET,
+                        help='Wall-clock limit in seconds for each halving search (0 = no limit)')
+    parser.add_argument('--compare-tree-search', action='store_true',
+                        help='Compare successive halving with the exhaustive grid and save the report')
+    parser.add_argument('--no-fit-cache', action='store_true',
+                        help='Retrain everything without reading or writing the fit cache')
+    parser.add_argument('--max-latency-ms', type=float, default=SELECT_MAX_LATENCY_MS,
+                        help='Single-row latency budget for the shipped models (default: $SELECT_MAX_LATENCY_MS)')
+    parser.add_argument('--max-artifact-mb', type=float, default=SELECT_MAX_ARTIFACT_MB,
+                        help='Artifact size budget for the shipped models (default: $SELECT_MAX_ARTIFACT_MB)')
+    parser.add_argument('--accuracy-tolerance', type=float, default=SELECT_ACCURACY_TOLERANCE,
+                        help='Accuracy points to give up for a faster model (default: $SELECT_ACCURACY_TOLERANCE or 0)')
+    parser.add_argument('--no-profile', action='store_true',
+                        help='Skip profiling and select on accuracy alone')
+    parser.add_argument('--profile-refit', action='store_true',
+                        help='Also time one fit of each chosen configuration (Fit_Seconds in the selection report)')
+    parser.add_argument('--compact-max-leaves', type=int, default=COMPACT_MAX_LEAF_NODES,
+                        help='Refit the compact forests with at most this many leaves per tree (default: $COMPACT_MAX_LEAF_NODES)')
+    parser.add_argument('--compact-trees', type=int, default=COMPACT_TREES,
+                        help='Keep only this many trees in the compact forests (default: $COMPACT_TREES)')
+    parser.add_argument('--no-compact', action='store_true', help='Skip writing the compact forest artifacts')
+    parser.add_argument('--no-plots', action='store_true', help='Skip rendering plots (fast CI/retrain runs)')
+    parser.add_argument('--plot-workers', type=int, default=plotting.PLOT_WORKERS,
+                        help='Processes rendering plots (default: $PLOT_WORKERS or one per CPU)')
+    args = parser.parse_args()
+    
     print("Developing forecasting models for budget prediction...")
     
     # Load preprocessed data
@@ -295,29 +837,67 @@ def main():
      X_test, y_test_revenue, y_test_expenditure,
      train_df, test_df) = split_data(df, features, targets)
     
-    # Train linear models
-    print("\nTraining linear models...")
-    linear_models = train_linear_models(X_train, y_train_revenue, y_train_expenditure)
-    
-    # Train tree-based models
-    print("\nTraining tree-based models...")
-    tree_models, rf_models = train_tree_models(X_train, y_train_revenue, y_train_expenditure)
-    
-    # Combine all models
-    all_models = {
-        'Revenue': {**linear_models['Revenue'], **tree_models['Revenue']},
-        'Expenditure': {**linear_models['Expenditure'], **tree_models['Expenditure']}
+    if args.compare_linear_search:
+        print("\nComparing linear model searches...")
+        compare_linear_searches(X_train, {'Revenue': y_train_revenue, 'Expenditure': y_train_expenditure})
+    
+    if args.compare_tree_search:
+        print("\nComparing tree model searches...")
+        compare_tree_searches(
+            X_train, {'Revenue': y_train_revenue, 'Expenditure': y_train_expenditure},
+            X_test, {'Revenue': y_test_revenue, 'Expenditure': y_test_expenditure},
+            time_budget=args.tree_budget
+        )
+    
+    # Train every (target, model) search concurrently within the CPU budget
+    print("\nTraining models...")
+    # The joint model trains on both targets at once, as a third "target"
+    y_trains = {
+        'Revenue': y_train_revenue,
+        'Expenditure': y_train_expenditure,
+        'Joint': np.column_stack([y_train_revenue, y_train_expenditure])
     }
+    specs = {**linear_model_specs(), **tree_model_specs()}
+    tasks = make_training_tasks(specs) + make_training_tasks(multi_output_model_specs(), target_names=('Joint',))
+    search_options = {'linear': args.linear_search, 'tree': args.tree_search, 'tree_budget': args.tree_budget}
+    fit_cache = None if args.no_fit_cache else FitCache(FIT_CACHE_DIR, FIT_CACHE_MAX_MB * 1e6)
+    all_models, search_seconds = run_training_schedule(tasks, X_train, y_trains, cpus=args.cpus,
+                                                    search_options=search_options, fit_cache=fit_cache)
+    multi_output_name, multi_output_model = next(iter(all_models.pop('Joint').items()))
+    rf_models = {target_name: target_models['Random Forest'] for target_name, target_models in all_models.items()}
     
     # Evaluate models
     print("\nEvaluating models...")
-    results = evaluate_models(all_models, X_test, y_test_revenue, y_test_expenditure)
+    results, predictions = evaluate_models(all_models, X_test, y_test_revenue, y_test_expenditure)
+    multi_output_results = evaluate_multi_output_model(multi_output_model, multi_output_name, X_test,
+                                                       y_test_revenue, y_test_expenditure)
+    
+    # Profile serving cost, then select under the latency and size budgets
+    budgets = {'max_latency_ms': args.max_latency_ms, 'max_artifact_mb': args.max_artifact_mb,
+               'accuracy_tolerance': args.accuracy_tolerance}
+    profiles = None
+    if args.no_profile:
+        if args.max_latency_ms is not None or args.max_artifact_mb is not None or args.accuracy_tolerance:
+            print("\nWarning: --no-profile set, so the selection budgets are ignored")
+    else:
+        print("\nProfiling models...")
+        profiles = profile_models({**all_models, 'Joint': {multi_output_name: multi_output_model}},
+                                  X_train, y_trains, X_test, search_seconds=search_seconds, refit=args.profile_refit)
+    
+    best_revenue_model, best_expenditure_model, chosen = select_best_models(
+        results, profiles, args.max_latency_ms, args.max_artifact_mb, args.accuracy_tolerance
+    )
+    
+    if profiles is not None:
+        save_selection_report({**results, 'Joint': {multi_output_name: multi_output_results}}, profiles, chosen, budgets)
     
     # Visualize results
-    print("\nVisualizing results...")
-    best_revenue_model, best_expenditure_model = visualize_results(
-        results, train_df, test_df, all_models, X_test, y_test_revenue, y_test_expenditure
-    )
+    if not args.no_plots:
+        print("\nVisualizing results...")
+        visualize_results(
+            results, predictions, all_models, {'Revenue': best_revenue_model, 'Expenditure': best_expenditure_model},
+            X_test.columns, y_test_revenue, y_test_expenditure, workers=args.plot_workers
+        )
     
     # Save best models
     print("\nSaving best models...")
@@ -334,6 +914,27 @@ def main():
     joblib.dump(rf_revenue, '../model/random_forest/revenue_model_rf.joblib')
     joblib.dump(rf_expenditure, '../model/random_forest/expenditure_model_rf.joblib')
     
+    # Save the multi-output model, which predicts [Revenue, Expenditure] together
+    print("\nSaving multi-output model...")
+    os.makedirs('../model/multi_output', exist_ok=True)
+    joblib.dump(multi_output_model, '../model/multi_output/forecast_model_multi.joblib')
+    
+    # Compact float32 variants of every forest, for RF_ARTIFACT=compact in the API
+    if not args.no_compact:
+        print("\nCompacting forests...")
+        compact_forests({
+            'Random Forest (Revenue)': (rf_revenue, y_train_revenue, {'Revenue': y_test_revenue},
+                                        '../model/random_forest/revenue_model_rf.joblib',
+                                        '../model/random_forest/revenue_model_rf_compact.npz'),
+            'Random Forest (Expenditure)': (rf_expenditure, y_train_expenditure, {'Expenditure': y_test_expenditure},
+                                            '../model/random_forest/expenditure_model_rf.joblib',
+                                            '../model/random_forest/expenditure_model_rf_compact.npz'),
+            multi_output_name: (multi_output_model, y_trains['Joint'],
+                                {'Revenue': y_test_revenue, 'Expenditure': y_test_expenditure},
+                                '../model/multi_output/forecast_model_multi.joblib',
+                                '../model/multi_output/forecast_model_multi_compact.npz')
+        }, X_train, X_test, max_leaf_nodes=args.compact_max_leaves, n_trees=args.compact_trees)
+    
     print("\nModel development completed.")
 
 if __name__ == "__main__":
@@ -1,185 +1,503 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import joblib
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import os
+import argparse
+import hashlib
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.base import clone
+import plotting
+from dataset import load_dataset
+from shared_arrays import attach_arrays, attached_arrays, share_arrays
+from evaluation_engine import (TARGETS, GroupAccumulator, absolute_percentage_errors, accuracy_results, group_codes,
+                               group_hashes, group_statistics, grouped_accuracy, grouped_means, merge_statistics,
+                               statistics_results)
 
-def load_data():
+# Processes running backtest origins in parallel
+BACKTEST_WORKERS = int(os.environ.get('BACKTEST_WORKERS', os.cpu_count() or 1))
+
+# Rows read per chunk in --stream mode
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', '100000'))
+
+# Per company-quarter statistics from the last --incremental run; only the current
+# models' statistics are kept (other files in the directory are left alone)
+EVAL_CACHE_DIR = os.environ.get('EVAL_CACHE_DIR', '../model/.eval_cache')
+
+# Statistics files, named after the SHA-256 model fingerprint
+EVAL_CACHE_FILE = re.compile(r'[0-9a-f]{64}\.joblib(\.tmp)?')
+
+def is_evaluation_column(name):
+    return 'Lag' in name or name in ['Company_ID', 'Quarter', 'Revenue', 'Expenditure']
+
+def model_paths(multi_output=False):
+    if multi_output:
+        return ['../model/multi_output/forecast_model_multi.joblib']
+    return ['../model/revenue_model.joblib', '../model/expenditure_model.joblib']
+
+def model_fingerprint(multi_output=False):
+    """Hash of the model artifacts' contents"""
+    digest = hashlib.sha256()
+    for path in model_paths(multi_output):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def comparison_models():
+    """The artifacts develop_models.py saves, for --compare without a model list"""
+    return {
+        'Best': model_paths(),
+        'Random Forest': ['../model/random_forest/revenue_model_rf.joblib',
+                          '../model/random_forest/expenditure_model_rf.joblib'],
+        'Multi-Output': model_paths(multi_output=True)
+    }
+
+def parse_model_spec(spec):
+    """NAME=REVENUE.joblib,EXPENDITURE.joblib, or NAME=MODEL.joblib for a multi-output model (NAME= optional)"""
+    name, _, artifacts = spec.rpartition('=')
+    paths = [path for path in artifacts.split(',') if path]
+    if len(paths) not in (1, 2):
+        raise argparse.ArgumentTypeError(f"expected one multi-output artifact or a revenue,expenditure pair: {spec}")
+    return name or os.path.splitext(os.path.basename(paths[0]))[0], paths
+
+def load_models(multi_output=False):
+    """Load the trained revenue and expenditure models"""
+    # The multi-output model predicts both targets, so it's passed alone as the revenue model
+    if multi_output:
+        return joblib.load(model_paths(multi_output)[0]), None
+    
+    revenue_model, expenditure_model = [joblib.load(path) for path in model_paths()]
+    return revenue_model, expenditure_model
+
+def load_data(multi_output=False):
     """Load the preprocessed data and trained models"""
-    # Load preprocessed data
-    df = pd.read_csv('../data/preprocessed_data.csv')
+    df = load_dataset('../data/preprocessed_data.csv', columns=is_evaluation_column)
+    return (df, *load_models(multi_output))
+
+def predict_targets(X, revenue_model, expenditure_model):
+    """Predict revenue and expenditure; with no expenditure model, revenue_model predicts both in one call"""
+    if expenditure_model is None:
+        predictions = revenue_model.predict(X)
+        return predictions[:, 0], predictions[:, 1]
     
-    # Load models
-    revenue_model = joblib.load('../model/revenue_model.joblib')
-    expenditure_model = joblib.load('../model/expenditure_model.joblib')
+    return revenue_model.predict(X), expenditure_model.predict(X)
+
+def prediction_errors(df, revenue_model, expenditure_model):
+    """Predict every row in one call per model and return each target's absolute percentage errors"""
+    features = [col for col in df.columns if 'Lag' in col]
+    y_pred_revenue, y_pred_expenditure = predict_targets(df[features], revenue_model, expenditure_model)
     
-    return df, revenue_model, expenditure_model
+    return {
+        'Revenue': absolute_percentage_errors(df['Revenue'], y_pred_revenue),
+        'Expenditure': absolute_percentage_errors(df['Expenditure'], y_pred_expenditure)
+    }
 
-def evaluate_models_on_companies(df, revenue_model, expenditure_model):
+def evaluate_models_on_companies(df, revenue_model, expenditure_model, errors=None):
     """Evaluate models on individual companies to assess performance across different company profiles"""
+    if errors is None:
+        errors = prediction_errors(df, revenue_model, expenditure_model)
     
-    # Get features
-    features = [col for col in df.columns if 'Lag' in col]
+    # Companies in order of appearance, skipping those with too few records
+    company_results_df = grouped_accuracy(df, 'Company_ID', errors, min_records=5)
     
-    # Group by company
-    companies = df['Company_ID'].unique()
+    # Save results
+    company_results_df.to_csv('../model/company_evaluation_results.csv', index=False)
     
-    company_results = []
+    return company_results_df
+
+def evaluate_model_stability(df, revenue_model, expenditure_model, errors=None):
+    """Evaluate model stability across different time periods"""
+    if errors is None:
+        errors = prediction_errors(df, revenue_model, expenditure_model)
     
-    for company_id in companies:
-        company_data = df[df['Company_ID'] == company_id]
-        
-        if len(company_data) < 5:  # Skip companies with too few records
-            continue
-        
-        # Get features and targets
-        X = company_data[features]
-        y_revenue = company_data['Revenue']
-        y_expenditure = company_data['Expenditure']
-        
-        # Make predictions
-        y_pred_revenue = revenue_model.predict(X)
-        y_pred_expenditure = expenditure_model.predict(X)
-        
-        # Calculate metrics
-        revenue_mape = np.mean(np.abs((y_revenue - y_pred_revenue) / y_revenue)) * 100
-        expenditure_mape = np.mean(np.abs((y_expenditure - y_pred_expenditure) / y_expenditure)) * 100
-        
-        revenue_accuracy = max(0, 100 - revenue_mape)
-        expenditure_accuracy = max(0, 100 - expenditure_mape)
+    # Quarters in sorted order, skipping those with too few records
+    quarter_results_df = grouped_accuracy(df, 'Quarter', errors, min_records=10, sort=True)
+    
+    # Save results
+    quarter_results_df.to_csv('../model/quarter_evaluation_results.csv', index=False)
+    
+    return quarter_results_df
+
+def stream_evaluation(csv_path, revenue_model, expenditure_model, chunk_rows=None):
+    """Evaluate per company and per quarter without loading the whole dataset
+
+    The CSV is read chunk_rows rows at a time; each chunk is predicted and folded into
+    running per-group sums, so memory stays bounded by the chunk size plus the number of
+    groups. Writes the same result files as the in-memory evaluation, plus MAPE, MAE,
+    RMSE and R² per group in *_evaluation_metrics.csv.
+    """
+    companies = GroupAccumulator('Company_ID')
+    quarters = GroupAccumulator('Quarter')
+    rows = 0
+    
+    for chunk in pd.read_csv(csv_path, usecols=is_evaluation_column, chunksize=chunk_rows or STREAM_CHUNK_ROWS):
+        features = [col for col in chunk.columns if 'Lag' in col]
+        y_pred_revenue, y_pred_expenditure = predict_targets(chunk[features], revenue_model, expenditure_model)
+        actuals = {'Revenue': chunk['Revenue'].to_numpy(), 'Expenditure': chunk['Expenditure'].to_numpy()}
+        predictions = {'Revenue': y_pred_revenue, 'Expenditure': y_pred_expenditure}
         
-        # Store results
-        company_results.append({
-            'Company_ID': company_id,
-            'Revenue_Accuracy': revenue_accuracy,
-            'Expenditure_Accuracy': expenditure_accuracy,
-            'Average_Accuracy': (revenue_accuracy + expenditure_accuracy) / 2,
-            'Records': len(company_data)
-        })
+        companies.update(chunk['Company_ID'].to_numpy(), actuals, predictions)
+        quarters.update(chunk['Quarter'].to_numpy(), actuals, predictions)
+        rows += len(chunk)
     
-    # Convert to DataFrame
-    company_results_df = pd.DataFrame(company_results)
+    # Same filters and ordering as evaluate_models_on_companies and evaluate_model_stability
+    company_results_df, company_metrics_df = companies.results(min_records=5)
+    quarter_results_df, quarter_metrics_df = quarters.results(min_records=10, sort=True)
+    print(f"Streamed {rows} rows into {len(companies.ids)} companies and {len(quarters.ids)} quarters")
     
     # Save results
     company_results_df.to_csv('../model/company_evaluation_results.csv', index=False)
+    quarter_results_df.to_csv('../model/quarter_evaluation_results.csv', index=False)
+    company_metrics_df.to_csv('../model/company_evaluation_metrics.csv', index=False)
+    quarter_metrics_df.to_csv('../model/quarter_evaluation_metrics.csv', index=False)
     
-    return company_results_df
+    return company_results_df, quarter_results_df
 
-def evaluate_model_stability(df, revenue_model, expenditure_model):
-    """Evaluate model stability across different time periods"""
+def incremental_evaluation(df, revenue_model, expenditure_model, fingerprint, cache_dir=None):
+    """Evaluate per company and per quarter, predicting only company-quarters whose rows changed
+
+    Sufficient statistics are stored per (company, quarter) cell together with a hash of
+    the cell's rows, in one file per model fingerprint. On a rerun, cells whose hash
+    matches are reused; only new or changed cells are predicted. Company and quarter
+    results are then merged from the cells, so a new quarter of data costs one quarter
+    of predictions. Writes the same files as stream_evaluation.
+    
+    Saving removes statistics stored for other fingerprints, which belong to models that
+    have since been retrained or replaced; files not named like statistics are kept.
+    """
+    cache_dir = cache_dir or EVAL_CACHE_DIR
+    cache_path = os.path.join(cache_dir, f'{fingerprint}.joblib')
+    
+    # Cells in order of first appearance, so companies keep the order of the full evaluation
+    cells = df.groupby(['Company_ID', 'Quarter'], sort=False, observed=True)
+    codes = cells.ngroup().to_numpy()
+    # Categorical keys, so the cache stores integer codes rather than one object per cell
+    keys = cells.size().reset_index()[['Company_ID', 'Quarter']].astype('category')
+    
+    value_columns = [col for col in df.columns if col not in ['Company_ID', 'Quarter']]
+    hashes = group_hashes(df[value_columns], codes, len(keys))
+    counts = np.bincount(codes, minlength=len(keys))
+    stats = {target: np.empty((len(keys), 5)) for target in TARGETS}
+    
+    # Reuse cached cells whose key and content hash both match
+    changed = np.ones(len(keys), dtype=bool)
+    if os.path.exists(cache_path):
+        cached = joblib.load(cache_path)
+        positions = pd.MultiIndex.from_frame(cached['keys']).get_indexer(pd.MultiIndex.from_frame(keys))
+        found = positions >= 0
+        matches = found.copy()
+        matches[found] = (cached['hashes'][positions[found]] == hashes[found]).all(axis=1)
+        changed = ~matches
+        for target in TARGETS:
+            stats[target][matches] = cached['stats'][target][positions[matches]]
+    
+    changed_cells = np.flatnonzero(changed)
+    rows = np.flatnonzero(changed[codes])
+    if len(rows):
+        features = [col for col in df.columns if 'Lag' in col]
+        subset = df.iloc[rows]
+        y_pred_revenue, y_pred_expenditure = predict_targets(subset[features], revenue_model, expenditure_model)
+        predictions = {'Revenue': y_pred_revenue, 'Expenditure': y_pred_expenditure}
+        
+        # Number the changed cells 0..n-1 for the subset's rows
+        local_codes = np.searchsorted(changed_cells, codes[rows])
+        for target in TARGETS:
+            _, stats[target][changed_cells] = group_statistics(
+                local_codes, len(changed_cells), subset[target].to_numpy(), predictions[target]
+            )
+    
+    print(f"Recomputed {len(changed_cells)} of {len(keys)} company-quarters ({len(rows)} of {len(df)} rows)")
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    joblib.dump({'keys': keys, 'hashes': hashes, 'stats': stats}, cache_path + '.tmp')
+    os.replace(cache_path + '.tmp', cache_path)
+    stale = [name for name in os.listdir(cache_dir)
+             if EVAL_CACHE_FILE.fullmatch(name) and name != os.path.basename(cache_path)]
+    for name in stale:
+        os.remove(os.path.join(cache_dir, name))
+    if stale:
+        print(f"Removed statistics for {len(stale)} other model fingerprint(s) from {cache_dir}")
+    
+    # Merge the cells into companies (first-appearance order) and quarters (sorted)
+    results = {}
+    for group_column, min_records, sort in [('Company_ID', 5, False), ('Quarter', 10, True)]:
+        cell_groups, group_keys = pd.factorize(keys[group_column])
+        group_stats = {}
+        for target in TARGETS:
+            group_counts, group_stats[target] = merge_statistics(cell_groups, len(group_keys), counts, stats[target])
+        group_keys = pd.Series(np.asarray(group_keys))
+        results[group_column] = statistics_results(group_column, group_keys, group_counts, group_stats,
+                                                   min_records, sort)
+    
+    (company_results_df, company_metrics_df), (quarter_results_df, quarter_metrics_df) = results.values()
     
-    # Get features
-    features = [col for col in df.columns if 'Lag' in col]
+    # Save results
+    company_results_df.to_csv('../model/company_evaluation_results.csv', index=False)
+    quarter_results_df.to_csv('../model/quarter_evaluation_results.csv', index=False)
+    company_metrics_df.to_csv('../model/company_evaluation_metrics.csv', index=False)
+    quarter_metrics_df.to_csv('../model/quarter_evaluation_metrics.csv', index=False)
     
-    # Group by quarter
-    quarters = df['Quarter'].unique()
-    quarters.sort()
+    return company_results_df, quarter_results_df
+
+def quarter_sort_key(quarter):
+    """Chronological key for a 'Q3 2023' quarter label"""
+    number, year = quarter.split()
+    return int(year), int(number.lstrip('Q'))
+
+def backtest_arrays(df, features):
+    """The feature matrix, targets and each row's quarter position, for backtest workers to share"""
+    quarters = sorted(df['Quarter'].unique(), key=quarter_sort_key)
+    quarter_positions = pd.Categorical(df['Quarter'], categories=quarters).codes
+    arrays = {
+        'X': df[features].to_numpy(),
+        'y': np.column_stack([df['Revenue'], df['Expenditure']]).astype(np.float64),
+        'quarter': quarter_positions.astype(np.int32)
+    }
+    return arrays, quarters
+
+def _run_backtest_origin(origin, window, revenue_model, expenditure_model):
+    """Retrain on the quarters before origin (the last window of them, if set) and forecast origin
+
+    The models are unfitted copies of the evaluated models' configuration, fitted in place.
+    """
+    start = time.time()
+    shared = attached_arrays()
+    quarter = shared['quarter']
+    first_train = 0 if window is None else max(0, origin - window)
+    train_rows = np.flatnonzero((quarter >= first_train) & (quarter < origin))
+    test_rows = np.flatnonzero(quarter == origin)
+    
+    # Keep the column names so predict sees the same features the models were fitted on
+    features = shared['features']
+    X_train = pd.DataFrame(shared['X'][train_rows], columns=features)
+    X_test = pd.DataFrame(shared['X'][test_rows], columns=features)
+    y_train = shared['y'][train_rows]
+    y_test = shared['y'][test_rows]
+    
+    if expenditure_model is None:
+        revenue_model.fit(X_train, y_train)
+    else:
+        revenue_model.fit(X_train, y_train[:, 0])
+        expenditure_model.fit(X_train, y_train[:, 1])
+    fit_end = time.time()
+    
+    y_pred_revenue, y_pred_expenditure = predict_targets(X_test, revenue_model, expenditure_model)
+    revenue_accuracy = max(0, 100 - np.mean(absolute_percentage_errors(y_test[:, 0], y_pred_revenue)) * 100)
+    expenditure_accuracy = max(0, 100 - np.mean(absolute_percentage_errors(y_test[:, 1], y_pred_expenditure)) * 100)
+    end = time.time()
+    
+    return {
+        'Origin': origin,
+        'Train_Quarters': origin - first_train,
+        'Train_Rows': len(train_rows),
+        'Test_Rows': len(test_rows),
+        'Revenue_Accuracy': revenue_accuracy,
+        'Expenditure_Accuracy': expenditure_accuracy,
+        'Average_Accuracy': (revenue_accuracy + expenditure_accuracy) / 2,
+        'Fit_Seconds': fit_end - start,
+        'Seconds': end - start,
+        'PID': os.getpid()
+    }
+
+def run_backtest(df, revenue_model, expenditure_model, min_train_quarters=4, window=None, workers=None):
+    """Walk-forward evaluation: for each quarter after the first min_train_quarters, retrain the
+    models' configuration on the earlier quarters and forecast that quarter
+
+    Origins run in parallel in a process pool; the data is dumped once and memory-mapped by
+    every worker instead of being pickled into each task.
+    """
+    features = [col for col in df.columns if 'Lag' in col]
+    workers = max(1, workers or BACKTEST_WORKERS)
+    start = time.time()
+    results = []
+    
+    # Each origin gets its own unfitted copy, so tasks don't carry the fitted models
+    def unfitted_models():
+        return clone(revenue_model), None if expenditure_model is None else clone(expenditure_model)
+    
+    arrays, quarters = backtest_arrays(df, features)
+    with share_arrays(arrays) as paths:
+        # Largest training sets first, so the slowest origins don't start last
+        origins = list(range(len(quarters) - 1, min_train_quarters - 1, -1))
+        print(f"Backtesting {len(origins)} origins on {workers} workers...")
+        
+        values = {'features': features}
+        if workers == 1:
+            attach_arrays(paths, values)
+            for origin in origins:
+                results.append(_run_backtest_origin(origin, window, *unfitted_models()))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(origins)), initializer=attach_arrays,
+                                     initargs=(paths, values)) as executor:
+                futures = [executor.submit(_run_backtest_origin, origin, window, *unfitted_models())
+                           for origin in origins]
+                for future in as_completed(futures):
+                    results.append(future.result())
+    
+    backtest_results_df = pd.DataFrame(sorted(results, key=lambda result: result['Origin']))
+    backtest_results_df.insert(0, 'Quarter', [quarters[origin] for origin in backtest_results_df['Origin']])
+    backtest_results_df = backtest_results_df.drop(columns='Origin')
+    
+    for _, result in backtest_results_df.iterrows():
+        print(f"  {result['Quarter']}: trained on {result['Train_Quarters']} quarters ({result['Train_Rows']} rows), "
+              f"revenue {result['Revenue_Accuracy']:.2f}%, expenditure {result['Expenditure_Accuracy']:.2f}%, "
+              f"{result['Seconds']:.2f}s (pid {result['PID']})")
+    print(f"Backtest completed in {time.time() - start:.2f}s "
+          f"({backtest_results_df['Seconds'].sum():.2f}s of origin work)")
     
-    quarter_results = []
+    # Save results
+    backtest_results_df.to_csv('../model/backtest_results.csv', index=False)
+    print("Backtest results saved to model/backtest_results.csv")
     
-    for quarter in quarters:
-        quarter_data = df[df['Quarter'] == quarter]
-        
-        if len(quarter_data) < 10:  # Skip quarters with too few records
-            continue
-        
-        # Get features and targets
-        X = quarter_data[features]
-        y_revenue = quarter_data['Revenue']
-        y_expenditure = quarter_data['Expenditure']
-        
-        # Make predictions
-        y_pred_revenue = revenue_model.predict(X)
-        y_pred_expenditure = expenditure_model.predict(X)
+    return backtest_results_df
+
+def comparison_arrays(df, features):
+    """The feature matrix, targets and company/quarter group codes for comparison workers to share,
+    plus the group keys"""
+    company_codes, company_keys = group_codes(df, ['Company_ID'])
+    quarter_codes, quarter_keys = group_codes(df, ['Quarter'], sort=True)
+    arrays = {
+        'X': df[features].to_numpy(),
+        'y': np.column_stack([df['Revenue'], df['Expenditure']]).astype(np.float64),
+        'Company_ID': company_codes.astype(np.int32),
+        'Quarter': quarter_codes.astype(np.int32)
+    }
+    return arrays, {'Company_ID': company_keys, 'Quarter': quarter_keys}
+
+def _evaluate_artifacts(name, paths):
+    """Load one model's artifacts and compute its mean APEs per company and per quarter"""
+    start = time.perf_counter()
+    models = [joblib.load(path) for path in paths]
+    revenue_model, expenditure_model = models if len(models) == 2 else (models[0], None)
+    load_seconds = time.perf_counter() - start
+    
+    shared = attached_arrays()
+    X = pd.DataFrame(shared['X'], columns=shared['features'], copy=False)
+    y = shared['y']
+    y_pred_revenue, y_pred_expenditure = predict_targets(X, revenue_model, expenditure_model)
+    errors = np.column_stack([absolute_percentage_errors(y[:, 0], y_pred_revenue),
+                              absolute_percentage_errors(y[:, 1], y_pred_expenditure)])
+    
+    # Only the per-group means go back to the parent, not the per-row errors
+    groups = {column: grouped_means(errors, shared[column], n_groups)
+              for column, n_groups in shared['n_groups'].items()}
+    
+    return {
+        'Model': name,
+        'groups': groups,
+        'Load_Seconds': load_seconds,
+        'Evaluation_Seconds': time.perf_counter() - start,
+        'PID': os.getpid()
+    }
+
+def compare_models(df, models, workers=None, output_dir='../model/model_comparison'):
+    """Evaluate several model artifacts per company and per quarter, one process per model at a time
+
+    models maps a name to its artifact paths (a revenue/expenditure pair or one multi-output
+    model). The data is dumped once and memory-mapped by every worker; each worker loads its
+    own artifacts, so no model is pickled between processes. Writes per-model company and
+    quarter results plus a side-by-side summary and per-quarter comparison.
+    """
+    features = [col for col in df.columns if 'Lag' in col]
+    workers = max(1, min(workers or BACKTEST_WORKERS, len(models)))
+    start = time.perf_counter()
+    results = []
+    
+    arrays, keys = comparison_arrays(df, features)
+    with share_arrays(arrays) as paths:
+        # Largest artifacts first, so the slowest models don't start last
+        names = sorted(models, key=lambda name: -sum(os.path.getsize(path) for path in models[name]))
+        print(f"Evaluating {len(names)} models on {workers} workers...")
         
-        # Calculate metrics
-        revenue_mape = np.mean(np.abs((y_revenue - y_pred_revenue) / y_revenue)) * 100
-        expenditure_mape = np.mean(np.abs((y_expenditure - y_pred_expenditure) / y_expenditure)) * 100
+        values = {'features': features, 'n_groups': {column: len(group_keys) for column, group_keys in keys.items()}}
+        if workers == 1:
+            attach_arrays(paths, values)
+            for name in names:
+                results.append(_evaluate_artifacts(name, models[name]))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach_arrays,
+                                     initargs=(paths, values)) as executor:
+                futures = [executor.submit(_evaluate_artifacts, name, models[name]) for name in names]
+                for future in as_completed(futures):
+                    results.append(future.result())
+    
+    os.makedirs(output_dir, exist_ok=True)
+    results = sorted(results, key=lambda result: list(models).index(result['Model']))
+    summary = []
+    quarter_comparison = keys['Quarter'].astype(str)
+    
+    for result in results:
+        name = result['Model']
+        company_results_df = accuracy_results(keys['Company_ID'], *result['groups']['Company_ID'], min_records=5)
+        quarter_results_df = accuracy_results(keys['Quarter'], *result['groups']['Quarter'], min_records=10)
         
-        revenue_accuracy = max(0, 100 - revenue_mape)
-        expenditure_accuracy = max(0, 100 - expenditure_mape)
+        slug = re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+        company_results_df.to_csv(os.path.join(output_dir, f'{slug}_company_results.csv'), index=False)
+        quarter_results_df.to_csv(os.path.join(output_dir, f'{slug}_quarter_results.csv'), index=False)
         
-        # Store results
-        quarter_results.append({
-            'Quarter': quarter,
-            'Revenue_Accuracy': revenue_accuracy,
-            'Expenditure_Accuracy': expenditure_accuracy,
-            'Average_Accuracy': (revenue_accuracy + expenditure_accuracy) / 2,
-            'Records': len(quarter_data)
+        quarter_comparison = quarter_comparison.merge(
+            quarter_results_df[['Quarter', 'Average_Accuracy']].astype({'Quarter': str})
+            .rename(columns={'Average_Accuracy': name}), on='Quarter', how='left'
+        )
+        summary.append({
+            'Model': name,
+            'Artifacts': ' '.join(models[name]),
+            'Overall_Accuracy': company_results_df['Average_Accuracy'].mean(),
+            'Revenue_Accuracy': company_results_df['Revenue_Accuracy'].mean(),
+            'Expenditure_Accuracy': company_results_df['Expenditure_Accuracy'].mean(),
+            'Companies_Meeting_Target': int((company_results_df['Average_Accuracy'] >= 70).sum()),
+            'Companies': len(company_results_df),
+            'Worst_Quarter_Accuracy': quarter_results_df['Average_Accuracy'].min(),
+            'Load_Seconds': result['Load_Seconds'],
+            'Evaluation_Seconds': result['Evaluation_Seconds'],
+            'PID': result['PID']
         })
     
-    # Convert to DataFrame
-    quarter_results_df = pd.DataFrame(quarter_results)
+    summary_df = pd.DataFrame(summary)
+    summary_df.to_csv(os.path.join(output_dir, 'comparison.csv'), index=False)
+    quarter_comparison.to_csv(os.path.join(output_dir, 'quarter_comparison.csv'), index=False)
     
-    # Save results
-    quarter_results_df.to_csv('../model/quarter_evaluation_results.csv', index=False)
+    for _, row in summary_df.iterrows():
+        print(f"  {row['Model']}: accuracy {row['Overall_Accuracy']:.2f}% (revenue {row['Revenue_Accuracy']:.2f}%, "
+              f"expenditure {row['Expenditure_Accuracy']:.2f}%), {row['Companies_Meeting_Target']} of "
+              f"{row['Companies']} companies meeting target, {row['Evaluation_Seconds']:.2f}s "
+              f"(load {row['Load_Seconds']:.2f}s, pid {row['PID']})")
+    print(f"Compared {len(summary_df)} models in {time.perf_counter() - start:.2f}s "
+          f"({summary_df['Evaluation_Seconds'].sum():.2f}s of model work)")
+    print(f"Comparison saved to {os.path.relpath(output_dir, '..')}/")
     
-    return quarter_results_df
+    return summary_df
 
-def visualize_evaluation_results(company_results_df, quarter_results_df):
+def visualize_evaluation_results(company_results_df, quarter_results_df, workers=None):
     """Create visualizations of evaluation results"""
     
     # Create plots directory if it doesn't exist
     os.makedirs('../model/evaluation_plots', exist_ok=True)
     
-    # Plot company accuracy distribution
-    plt.figure(figsize=(12, 6))
-    sns.histplot(company_results_df['Average_Accuracy'], bins=20, kde=True)
-    plt.axvline(x=70, color='r', linestyle='--', label='Target Accuracy (70%)')
-    plt.title('Distribution of Model Accuracy Across Companies')
-    plt.xlabel('Average Accuracy (%)')
-    plt.ylabel('Count')
-    plt.legend()
-    plt.grid(True)
-    plt.savefig('../model/evaluation_plots/company_accuracy_distribution.png')
-    
-    # Plot top and bottom performing companies
-    top_companies = company_results_df.nlargest(5, 'Average_Accuracy')
-    bottom_companies = company_results_df.nsmallest(5, 'Average_Accuracy')
-    
-    plt.figure(figsize=(14, 8))
-    
-    # Top companies
-    plt.subplot(2, 1, 1)
-    plt.bar(top_companies['Company_ID'].astype(str), top_companies['Average_Accuracy'], color='green')
-    plt.title('Top 5 Companies by Model Accuracy')
-    plt.xlabel('Company ID')
-    plt.ylabel('Average Accuracy (%)')
-    plt.ylim(0, 100)
-    plt.grid(True, axis='y')
-    
-    # Bottom companies
-    plt.subplot(2, 1, 2)
-    plt.bar(bottom_companies['Company_ID'].astype(str), bottom_companies['Average_Accuracy'], color='red')
-    plt.title('Bottom 5 Companies by Model Accuracy')
-    plt.xlabel('Company ID')
-    plt.ylabel('Average Accuracy (%)')
-    plt.ylim(0, 100)
-    plt.axhline(y=70, color='r', linestyle='--', label='Target Accuracy (70%)')
-    plt.legend()
-    plt.grid(True, axis='y')
-    
-    plt.tight_layout()
-    plt.savefig('../model/evaluation_plots/top_bottom_companies.png')
-    
-    # Plot accuracy over time
-    plt.figure(figsize=(12, 6))
-    plt.plot(quarter_results_df['Quarter'], quarter_results_df['Revenue_Accuracy'], 'b-', marker='o', label='Revenue Accuracy')
-    plt.plot(quarter_results_df['Quarter'], quarter_results_df['Expenditure_Accuracy'], 'r-', marker='o', label='Expenditure Accuracy')
-    plt.axhline(y=70, color='k', linestyle='--', label='Target Accuracy (70%)')
-    plt.title('Model Accuracy Over Time')
-    plt.xlabel('Quarter')
-    plt.ylabel('Accuracy (%)')
-    plt.xticks(rotation=45)
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig('../model/evaluation_plots/accuracy_over_time.png')
-    
-    # Close all plots
-    plt.close('all')
+    jobs = [
+        (plotting.plot_accuracy_distribution, {
+            'path': '../model/evaluation_plots/company_accuracy_distribution.png',
+            'accuracies': company_results_df['Average_Accuracy'].to_numpy()
+        }),
+        (plotting.plot_top_bottom_companies, {
+            'path': '../model/evaluation_plots/top_bottom_companies.png',
+            'top_companies': company_results_df.nlargest(5, 'Average_Accuracy')[['Company_ID', 'Average_Accuracy']],
+            'bottom_companies': company_results_df.nsmallest(5, 'Average_Accuracy')[['Company_ID', 'Average_Accuracy']]
+        }),
+        (plotting.plot_accuracy_over_time, {
+            'path': '../model/evaluation_plots/accuracy_over_time.png',
+            'quarters': list(quarter_results_df['Quarter']),
+            'revenue_accuracies': quarter_results_df['Revenue_Accuracy'].to_numpy(),
+            'expenditure_accuracies': quarter_results_df['Expenditure_Accuracy'].to_numpy()
+        })
+    ]
+    
+    start = time.perf_counter()
+    rendered = plotting.render_figures(jobs, workers)
+    print(f"Rendered {len(rendered)} plots in {time.perf_counter() - start:.2f}s")
 
 def create_evaluation_report(company_results_df, quarter_results_df):
     """Create a comprehensive evaluation report"""
@@ -255,23 +573,96 @@ Visualizations of the evaluation results can be found in the `model/evaluation_p
     
     return report
 
-def main():
-    print("Evaluating budget forecasting models...")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluate the budget forecasting models')
+    parser.add_argument('--multi-output', action='store_true', help='Evaluate the multi-output model instead of the default pair')
+    # Each mode replaces the default one-pass evaluation, so at most one can be chosen
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--backtest', action='store_true',
+                      help='Walk-forward backtest: retrain at each quarter and forecast the next one')
+    parser.add_argument('--min-train-quarters', type=int, default=4, help='Quarters before the first backtest origin')
+    parser.add_argument('--window', type=int, help='Train each origin on only its last N quarters (default: all earlier quarters)')
+    mode.add_argument('--compare', nargs='*', type=parse_model_spec, metavar='[NAME=]ARTIFACT[,ARTIFACT]',
+                      help='Evaluate several models side by side: revenue,expenditure artifact pairs or '
+                           'multi-output artifacts (default: the best, random forest and multi-output models)')
+    parser.add_argument('--workers', type=int, default=BACKTEST_WORKERS,
+                        help='Processes running backtest origins or compared models '
+                             '(default: $BACKTEST_WORKERS or one per CPU)')
+    mode.add_argument('--stream', action='store_true',
+                      help='Read the data in chunks instead of loading it, for datasets larger than memory')
+    parser.add_argument('--chunk-rows', type=int, default=STREAM_CHUNK_ROWS,
+                        help='Rows per chunk with --stream (default: $STREAM_CHUNK_ROWS or 100000)')
+    mode.add_argument('--incremental', action='store_true',
+                      help='Reuse stored per company-quarter statistics and only predict rows that changed')
+    parser.add_argument('--no-plots', action='store_true', help='Skip rendering the evaluation plots')
+    parser.add_argument('--plot-workers', type=int, default=plotting.PLOT_WORKERS,
+                        help='Processes rendering plots (default: $PLOT_WORKERS or one per CPU)')
+    args = parser.parse_args(argv)
+    if args.compare is not None and args.multi_output:
+        parser.error("--multi-output selects the model for a single evaluation; "
+                     "pass multi-output artifacts to --compare instead")
     
-    # Load data and models
-    df, revenue_model, expenditure_model = load_data()
-    
-    # Evaluate models on individual companies
-    print("Evaluating models on individual companies...")
-    company_results_df = evaluate_models_on_companies(df, revenue_model, expenditure_model)
+    print("Evaluating budget forecasting models...")
     
-    # Evaluate model stability across time periods
-    print("Evaluating model stability across time periods...")
-    quarter_results_df = evaluate_model_stability(df, revenue_model, expenditure_model)
+    if args.compare is not None:
+        if args.compare:
+            models = dict(args.compare)
+        else:
+            models = {name: paths for name, paths in comparison_models().items() if all(map(os.path.exists, paths))}
+        missing = [path for paths in models.values() for path in paths if not os.path.exists(path)]
+        if missing or not models:
+            parser.error(f"Model artifacts not found: {', '.join(missing) or 'no trained models'}")
+        
+        df = load_dataset('../data/preprocessed_data.csv', columns=is_evaluation_column)
+        print("Comparing models over companies and quarters...")
+        compare_models(df, models, workers=args.workers)
+        print("\nModel evaluation completed.")
+        return
+    
+    if args.stream:
+        # Only the models are loaded; the data is read chunk by chunk
+        revenue_model, expenditure_model = load_models(multi_output=args.multi_output)
+        print("Streaming evaluation over companies and quarters...")
+        start = time.perf_counter()
+        company_results_df, quarter_results_df = stream_evaluation(
+            '../data/preprocessed_data.csv', revenue_model, expenditure_model, chunk_rows=args.chunk_rows
+        )
+        print(f"Evaluated in {time.perf_counter() - start:.2f}s")
+    elif args.backtest:
+        df, revenue_model, expenditure_model = load_data(multi_output=args.multi_output)
+        print("Running rolling-origin backtest...")
+        run_backtest(df, revenue_model, expenditure_model, min_train_quarters=args.min_train_quarters,
+                     window=args.window, workers=args.workers)
+        print("\nModel evaluation completed.")
+        return
+    elif args.incremental:
+        df, revenue_model, expenditure_model = load_data(multi_output=args.multi_output)
+        print("Evaluating incrementally over companies and quarters...")
+        start = time.perf_counter()
+        company_results_df, quarter_results_df = incremental_evaluation(
+            df, revenue_model, expenditure_model, model_fingerprint(args.multi_output)
+        )
+        print(f"Evaluated in {time.perf_counter() - start:.2f}s")
+    else:
+        df, revenue_model, expenditure_model = load_data(multi_output=args.multi_output)
+        
+        # One prediction pass over every row, shared by all the groupings
+        start = time.perf_counter()
+        errors = prediction_errors(df, revenue_model, expenditure_model)
+        
+        # Evaluate models on individual companies
+        print("Evaluating models on individual companies...")
+        company_results_df = evaluate_models_on_companies(df, revenue_model, expenditure_model, errors)
+        
+        # Evaluate model stability across time periods
+        print("Evaluating model stability across time periods...")
+        quarter_results_df = evaluate_model_stability(df, revenue_model, expenditure_model, errors)
+        print(f"Evaluated {len(df)} rows in {time.perf_counter() - start:.2f}s")
     
     # Visualize evaluation results
-    print("Creating evaluation visualizations...")
-    visualize_evaluation_results(company_results_df, quarter_results_df)
+    if not args.no_plots:
+        print("Creating evaluation visualizations...")
+        visualize_evaluation_results(company_results_df, quarter_results_df, workers=args.plot_workers)
     
     # Create evaluation report
     print("Creating evaluation report...")
@@ -286,7 +677,8 @@ def main():
     print(f"Overall Accuracy: {overall_accuracy:.2f}%")
     print(f"Companies Meeting Target (70%): {companies_meeting_target} out of {company_results_df.shape[0]} ({percentage_meeting_target:.2f}%)")
     print(f"Evaluation report saved to model/evaluation_report.md")
-    print(f"Evaluation visualizations saved to model/evaluation_plots/")
+    if not args.no_plots:
+        print(f"Evaluation visualizations saved to model/evaluation_plots/")
     
     print("\nModel evaluation completed.")
 
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+TARGETS = ['Revenue', 'Expenditure']
+
+
+def absolute_percentage_errors(y_true, y_pred):
+    """|(actual - predicted) / actual| per row"""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    return np.abs((y_true - y_pred) / y_true)
+
+
+def group_codes(df, group_columns, sort=False):
+    """Integer group id per row and one row of group keys per id
+
+    sort=False numbers groups in order of first appearance, sort=True in sorted key order.
+    """
+    grouped = df.groupby(group_columns, sort=sort, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    keys = grouped.size().reset_index()[group_columns]
+    return codes, keys
+
+
+def grouped_means(values, codes, n_groups):
+    """Mean of values per group code, for every column of a (rows, columns) array
+
+    Rows are sorted by group, then all groups with the same number of rows are reduced
+    together as one (groups, rows) block. Each mean is then the same contiguous
+    reduction np.mean runs on that group alone, so results match a per-group loop
+    exactly, without one Python call per group.
+    """
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    values = values[order]
+
+    means = np.empty((n_groups, values.shape[1]))
+    for size in np.unique(counts):
+        if size == 0:
+            continue
+        groups = np.flatnonzero(counts == size)
+        rows = starts[groups][:, None] + np.arange(size)
+        for column in range(values.shape[1]):
+            means[groups, column] = values[rows, column].mean(axis=1)
+
+    return means, counts
+
+
+def grouped_accuracy(df, group_columns, errors, min_records=0, sort=False):
+    """Revenue/expenditure accuracy (100 - MAPE, floored at 0) per group
+
+    errors maps each target to its absolute percentage errors, aligned with df's rows.
+    Groups with fewer than min_records rows are dropped. Columns match the per-company
+    and per-quarter result files: the group columns, <Target>_Accuracy for each target,
+    Average_Accuracy and Records.
+    """
+    group_columns = [group_columns] if isinstance(group_columns, str) else list(group_columns)
+    codes, keys = group_codes(df, group_columns, sort=sort)
+    means, counts = grouped_means(np.column_stack([errors[target] for target in TARGETS]), codes, len(keys))
+    return accuracy_results(keys, means, counts, min_records)
+
+
+def accuracy_results(keys, means, counts, min_records=0):
+    """The grouped_accuracy table from group keys and per-group mean APEs (one column per target)"""
+    group_columns = list(keys.columns)
+    results = keys.copy()
+    for column, target in enumerate(TARGETS):
+        results[f'{target}_Accuracy'] = np.maximum(0, 100 - means[:, column] * 100)
+    results['Average_Accuracy'] = (results['Revenue_Accuracy'] + results['Expenditure_Accuracy']) / 2
+    results['Records'] = counts
+
+    results = results[counts >= min_records].reset_index(drop=True)
+
+    # Plain values rather than categoricals, like the per-group loop produced
+    for column in group_columns:
+        if isinstance(results[column].dtype, pd.CategoricalDtype):
+            results[column] = results[column].astype(results[column].cat.categories.dtype)
+
+    return results
+
+
+# Sufficient statistics kept per group and target: sums of absolute percentage, absolute
+# and squared errors, and the mean and M2 (sum of squared deviations) of the actual values
+STATISTICS = ['ape', 'abs_error', 'sq_error', 'mean', 'm2']
+
+
+def group_statistics(codes, n_groups, y, y_pred):
+    """Row counts and a (groups, STATISTICS) array for one target"""
+    y = np.asarray(y, dtype=np.float64)
+    error = y - y_pred
+    counts = np.bincount(codes, minlength=n_groups)
+
+    stats = np.empty((n_groups, len(STATISTICS)))
+    stats[:, 0] = np.bincount(codes, absolute_percentage_errors(y, y_pred), n_groups)
+    stats[:, 1] = np.bincount(codes, np.abs(error), n_groups)
+    stats[:, 2] = np.bincount(codes, error ** 2, n_groups)
+    with np.errstate(invalid='ignore'):
+        stats[:, 3] = np.bincount(codes, y, n_groups) / counts
+    stats[:, 4] = np.bincount(codes, (y - stats[codes, 3]) ** 2, n_groups)
+    return counts, stats
+
+
+def merge_statistics(codes, n_groups, counts, stats):
+    """Combine per-part statistics (e.g. per company and quarter) into per-group statistics
+
+    The sums add up; the means and M2s combine with the parallel variance formula.
+    """
+    merged_counts = np.bincount(codes, counts, n_groups).astype(np.int64)
+    merged = np.empty((n_groups, len(STATISTICS)))
+    for column in range(3):
+        merged[:, column] = np.bincount(codes, stats[:, column], n_groups)
+
+    with np.errstate(invalid='ignore'):
+        merged[:, 3] = np.bincount(codes, stats[:, 3] * counts, n_groups) / merged_counts
+    merged[:, 4] = np.bincount(codes, stats[:, 4] + counts * (stats[:, 3] - merged[codes, 3]) ** 2, n_groups)
+    return merged_counts, merged
+
+
+def statistics_results(group_column, keys, counts, stats, min_records=0, sort=False):
+    """Accuracy per group in the grouped_accuracy layout, and MAPE/MAE/RMSE/R² per group and target
+
+    stats maps each target to its (groups, STATISTICS) array.
+    """
+    accuracy = pd.DataFrame({group_column: keys})
+    metrics = pd.DataFrame({group_column: keys})
+
+    for target in TARGETS:
+        mape = stats[target][:, 0] / counts * 100
+        accuracy[f'{target}_Accuracy'] = np.maximum(0, 100 - mape)
+        metrics[f'{target}_MAPE'] = mape
+        metrics[f'{target}_MAE'] = stats[target][:, 1] / counts
+        metrics[f'{target}_RMSE'] = np.sqrt(stats[target][:, 2] / counts)
+        # Undefined (inf/nan) for a group whose actual values are all equal
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics[f'{target}_R2'] = 1 - stats[target][:, 2] / stats[target][:, 4]
+
+    accuracy['Average_Accuracy'] = (accuracy['Revenue_Accuracy'] + accuracy['Expenditure_Accuracy']) / 2
+    accuracy['Records'] = counts
+    metrics['Records'] = counts
+
+    keep = counts >= min_records
+    accuracy, metrics = accuracy[keep], metrics[keep]
+    if sort:
+        order = np.argsort(accuracy[group_column].to_numpy(), kind='stable')
+        accuracy, metrics = accuracy.iloc[order], metrics.iloc[order]
+
+    return accuracy.reset_index(drop=True), metrics.reset_index(drop=True)
+
+
+class GroupAccumulator:
+    """Running per-group error statistics, updated one chunk of rows at a time
+
+    Each chunk's group statistics are merged into the running ones, so MAPE/accuracy,
+    MAE, RMSE and R² come out exact with memory proportional to the number of groups
+    rather than rows.
+    """
+
+    def __init__(self, group_column):
+        self.group_column = group_column
+        self.ids = {}
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.stats = {target: np.zeros((0, len(STATISTICS))) for target in TARGETS}
+
+    def _group_ids(self, keys):
+        """Global id per row, numbering new groups in order of first appearance"""
+        codes, uniques = pd.factorize(keys)
+        ids = np.array([self.ids.setdefault(key, len(self.ids)) for key in uniques], dtype=np.int64)
+
+        # Grow the accumulators for groups seen for the first time
+        grow = len(self.ids) - len(self.counts)
+        if grow > 0:
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=np.int64)])
+            for target in TARGETS:
+                self.stats[target] = np.concatenate([self.stats[target], np.zeros((grow, len(STATISTICS)))])
+
+        return codes, ids
+
+    def update(self, keys, actuals, predictions):
+        """Add a chunk: group keys per row plus actual and predicted values per target"""
+        codes, ids = self._group_ids(keys)
+        # Running and chunk statistics of the groups in this chunk, merged pairwise
+        parts = np.concatenate([np.arange(len(ids)), np.arange(len(ids))])
+
+        for target in TARGETS:
+            counts, chunk_stats = group_statistics(codes, len(ids), actuals[target], predictions[target])
+            merged_counts, self.stats[target][ids] = merge_statistics(
+                parts, len(ids), np.concatenate([self.counts[ids], counts]),
+                np.concatenate([self.stats[target][ids], chunk_stats])
+            )
+
+        self.counts[ids] = merged_counts
+
+    def results(self, min_records=0, sort=False):
+        """Accuracy and MAPE/MAE/RMSE/R² per group, see statistics_results"""
+        keys = pd.Series(list(self.ids)).infer_objects()
+        return statistics_results(self.group_column, keys, self.counts, self.stats, min_records, sort)
+
+
+def group_hashes(df, codes, n_groups):
+    """Order-independent 128-bit content hash per group, from per-row hashes of df
+
+    Each row is hashed twice with different keys and the hashes are summed per group
+    (wrapping at 2**64), so any changed, added or removed row changes its group's hash.
+    """
+    hashes = np.zeros((n_groups, 2), dtype=np.uint64)
+    for column, hash_key in enumerate(['0123456789123456', '6543210987654321']):
+        row_hashes = pd.util.hash_pandas_object(df, index=False, hash_key=hash_key).to_numpy()
+        np.add.at(hashes[:, column], codes, row_hashes)
+    return hashes
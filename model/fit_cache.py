@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import time
+import joblib
+import numpy as np
+import sklearn
+
+# Part of every key; bump it when entries written by earlier code must not be reused.
+# 2: plain-fit tasks (no grid) could store another target's model under their key
+KEY_VERSION = 2
+
+
+def hash_array(array):
+    """Hash an array's dtype, shape and contents"""
+    array = np.ascontiguousarray(np.asarray(array))
+    digest = hashlib.sha256(f'{array.dtype.str}{array.shape}'.encode())
+    digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class FitCache:
+    """Persistent store of fitted estimators keyed on everything that determines the fit
+
+    A key covers the training data, feature list, estimator class and parameters, the
+    searched grid and the search/CV configuration, plus the sklearn version the model
+    was pickled with and KEY_VERSION. Entries are plain joblib files; the least recently used ones are
+    evicted once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(data_hash, features, estimator, param_grid, search_config):
+        estimator_class = f'{type(estimator).__module__}.{type(estimator).__name__}'
+        description = json.dumps({
+            'data': data_hash,
+            'features': list(features),
+            'estimator': estimator_class,
+            'estimator_params': {name: repr(value) for name, value in sorted(estimator.get_params().items())},
+            'param_grid': None if param_grid is None else {name: repr(values) for name, values in sorted(param_grid.items())},
+            'search': search_config,
+            'sklearn': sklearn.__version__,
+            'version': KEY_VERSION
+        }, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.joblib')
+
+    def get(self, key):
+        """The cached entry for key, or None"""
+        path = self._path(key)
+        try:
+            entry = joblib.load(path)
+        except (OSError, EOFError, ValueError):
+            # Missing, or a truncated/corrupt file from an interrupted run
+            self.misses += 1
+            return None
+
+        # Touch the file so eviction treats it as recently used
+        os.utime(path)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        joblib.dump(dict(entry, cached_at=time.time()), path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes; returns the count deleted"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.joblib') and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+
+        return removed
+
+    def stats(self):
+        sizes = [
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory) if name.endswith('.joblib')
+        ]
+        return {'entries': len(sizes), 'bytes': sum(sizes), 'hits': self.hits, 'misses': self.misses}
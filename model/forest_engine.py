@@ -0,0 +1,238 @@
+import os
+import time
+import numpy as np
+import joblib
+
+
+def save_array(path, array):
+    """Save an array as .npy via a temporary file and an atomic rename"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(path + '.tmp', path)
+
+
+class FlatForest:
+    """Array-based inference engine for a fitted sklearn forest regressor
+
+    All trees are flattened into contiguous node arrays (feature, threshold, left,
+    right, value) with per-tree root offsets. Leaves point back at themselves, so
+    prediction is a fixed number of vectorized steps across every (row, tree) pair
+    instead of sklearn's per-tree traversal.
+
+    This removes sklearn's per-call overhead, which dominates small batches like a
+    single API request. sklearn's compiled traversal is still faster for very large
+    batches, so callers should route those to forest.predict.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Flatten the trees of a fitted RandomForestRegressor (or any forest of regression trees)"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes)
+
+            # Leaves loop back to themselves so extra traversal steps are no-ops
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value[:, :, 0])
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max_depth
+        )
+
+    # Arrays written by save() and read back by load(), in constructor order
+    ARRAY_NAMES = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+
+    def save(self, directory, prefix):
+        """Write each node array to its own .npy file so workers can memory-map them
+
+        Files are written under a temporary name and renamed into place, so a worker
+        that has the previous arrays mapped keeps reading them untouched.
+        """
+        for name in self.ARRAY_NAMES:
+            save_array(os.path.join(directory, f'{prefix}_{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, prefix, max_depth, mmap_mode='r'):
+        """Load arrays written by save(); with mmap_mode they're shared through the page cache"""
+        # np.asarray drops the memmap subclass but keeps the mapped buffer
+        arrays = {
+            name: np.asarray(np.load(os.path.join(directory, f'{prefix}_{name}.npy'), mmap_mode=mmap_mode))
+            for name in cls.ARRAY_NAMES
+        }
+        return cls(max_depth=max_depth, **arrays)
+
+    # Node index arrays; stored as int32 in compressed files and widened back on load
+    INDEX_NAMES = ['feature', 'left', 'right', 'roots']
+
+    def compact(self):
+        """Copy with float32 thresholds and values
+
+        Thresholds are rounded down to the nearest float32, so every float32 input (and
+        inputs are compared as float32, like sklearn does) takes the same branch as
+        before. Only the leaf values lose precision.
+        """
+        threshold = self.threshold.astype(np.float32)
+        rounded_up = threshold > self.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+
+        return FlatForest(
+            feature=self.feature,
+            threshold=threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value.astype(np.float32),
+            roots=self.roots,
+            max_depth=self.max_depth
+        )
+
+    def save_compressed(self, path):
+        """Write every array plus max_depth to one compressed .npz file, node indices as int32"""
+        arrays = {name: getattr(self, name) for name in self.ARRAY_NAMES}
+        if self.n_nodes < np.iinfo(np.int32).max:
+            arrays.update({name: arrays[name].astype(np.int32) for name in self.INDEX_NAMES})
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, max_depth=self.max_depth, **arrays)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load_compressed(cls, path):
+        """Load a forest written by save_compressed"""
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in cls.ARRAY_NAMES}
+            max_depth = int(data['max_depth'])
+
+        # take() would convert int32 indices to intp on every call
+        arrays.update({name: arrays[name].astype(np.intp) for name in cls.INDEX_NAMES})
+        return cls(max_depth=max_depth, **arrays)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAY_NAMES)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def n_outputs(self):
+        return self.value.shape[1]
+
+    def apply(self, X):
+        """Get the leaf index reached by every row in every tree, shape (rows, trees)"""
+        # sklearn compares float32 copies of the inputs against the thresholds; compact
+        # forests have float32 thresholds, so the comparison stays in float32
+        X = np.asarray(X, dtype=np.float32).astype(self.threshold.dtype, copy=False)
+        n_rows, n_features = X.shape
+        X_flat = X.ravel()
+
+        # One entry per (row, tree) pair, row-major, with the row's offset into X_flat
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, self.n_trees)
+
+        for _ in range(self.max_depth):
+            go_left = X_flat.take(row_offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+
+        return nodes.reshape(n_rows, self.n_trees)
+
+    def predict(self, X, chunk_size=1024):
+        """Predict like forest.predict, processing rows in chunks to bound memory"""
+        X = np.asarray(X)
+        predictions = np.empty((len(X), self.n_outputs))
+
+        for start in range(0, len(X), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            # Accumulate in float64 so compact (float32) values average like sklearn's
+            predictions[start:start + chunk_size] = self.value[leaves].mean(axis=1, dtype=np.float64)
+
+        return predictions[:, 0] if self.n_outputs == 1 else predictions
+
+
+def compare_with_sklearn(forest, X, repeats=5):
+    """Check that FlatForest matches forest.predict on X and time both"""
+    engine = FlatForest.from_sklearn(forest)
+    X = np.asarray(X, dtype=np.float64)
+
+    expected = forest.predict(X)
+    actual = engine.predict(X)
+    max_error = float(np.max(np.abs(actual - expected)))
+
+    def best_time(fn):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn(X)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    sklearn_time = best_time(forest.predict)
+    engine_time = best_time(engine.predict)
+
+    return {
+        'trees': engine.n_trees,
+        'nodes': engine.n_nodes,
+        'max_depth': engine.max_depth,
+        'rows': len(X),
+        'max_abs_error': max_error,
+        'sklearn_ms': sklearn_time * 1000,
+        'engine_ms': engine_time * 1000,
+        'speedup': sklearn_time / engine_time if engine_time > 0 else float('inf')
+    }
+
+
+def main():
+    print("Comparing flattened Random Forest inference with sklearn...")
+
+    # The API feeds the forests standardized features, so sample rows from N(0, 1)
+    rng = np.random.default_rng(42)
+
+    for target_name in ['revenue', 'expenditure']:
+        forest = joblib.load(f'../model/random_forest/{target_name}_model_rf.joblib')
+
+        for rows in [1, 100, 1000, 10000]:
+            X = rng.standard_normal((rows, forest.n_features_in_))
+            result = compare_with_sklearn(forest, X)
+            print(f"{target_name.title()} ({result['trees']} trees, depth {result['max_depth']}), {rows} rows:")
+            print(f"  sklearn: {result['sklearn_ms']:.3f} ms, engine: {result['engine_ms']:.3f} ms, "
+                  f"speedup: {result['speedup']:.1f}x, max abs error: {result['max_abs_error']:.3e}")
+
+    print("\nComparison completed.")
+
+
+if __name__ == "__main__":
+    main()
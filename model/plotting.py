@@ -0,0 +1,152 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Figures render in worker processes; 0 means one per CPU (capped at the number of figures)
+PLOT_WORKERS = int(os.environ.get('PLOT_WORKERS', '0'))
+
+
+def _pyplot():
+    """Import pyplot on the non-interactive backend; only called when a figure is drawn"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_accuracy_comparison(path, model_names, revenue_accuracies, expenditure_accuracies):
+    import numpy as np
+    plt = _pyplot()
+    plt.figure(figsize=(12, 6))
+
+    x = np.arange(len(model_names))
+    width = 0.35
+
+    plt.bar(x - width/2, revenue_accuracies, width, label='Revenue')
+    plt.bar(x + width/2, expenditure_accuracies, width, label='Expenditure')
+
+    plt.xlabel('Model')
+    plt.ylabel('Accuracy (%)')
+    plt.title('Model Accuracy Comparison')
+    plt.xticks(x, model_names, rotation=45)
+    plt.axhline(y=70, color='r', linestyle='--', label='Target Accuracy (70%)')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close('all')
+
+
+def plot_actual_vs_predicted(path, actual, predicted, target_label, model_name):
+    plt = _pyplot()
+    plt.figure(figsize=(10, 6))
+    plt.scatter(actual, predicted, alpha=0.5)
+    plt.plot([actual.min(), actual.max()], [actual.min(), actual.max()], 'r--')
+    plt.xlabel(f'Actual {target_label}')
+    plt.ylabel(f'Predicted {target_label}')
+    plt.title(f'Actual vs Predicted {target_label} ({model_name})')
+    plt.grid(True)
+    plt.savefig(path)
+    plt.close('all')
+
+
+def plot_feature_importance(path, feature_names, feature_importances, target_label, model_name):
+    import numpy as np
+    plt = _pyplot()
+    plt.figure(figsize=(12, 6))
+    indices = np.argsort(feature_importances)[::-1]
+
+    plt.bar(range(len(feature_importances)), feature_importances[indices])
+    plt.xticks(range(len(feature_importances)), [feature_names[i] for i in indices], rotation=90)
+    plt.xlabel('Features')
+    plt.ylabel('Importance')
+    plt.title(f'Feature Importance for {target_label} Prediction ({model_name})')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close('all')
+
+
+def plot_accuracy_distribution(path, accuracies):
+    import seaborn as sns
+    plt = _pyplot()
+    plt.figure(figsize=(12, 6))
+    sns.histplot(accuracies, bins=20, kde=True)
+    plt.axvline(x=70, color='r', linestyle='--', label='Target Accuracy (70%)')
+    plt.title('Distribution of Model Accuracy Across Companies')
+    plt.xlabel('Average Accuracy (%)')
+    plt.ylabel('Count')
+    plt.legend()
+    plt.grid(True)
+    plt.savefig(path)
+    plt.close('all')
+
+
+def plot_top_bottom_companies(path, top_companies, bottom_companies):
+    plt = _pyplot()
+    plt.figure(figsize=(14, 8))
+
+    # Top companies
+    plt.subplot(2, 1, 1)
+    plt.bar(top_companies['Company_ID'].astype(str), top_companies['Average_Accuracy'], color='green')
+    plt.title('Top 5 Companies by Model Accuracy')
+    plt.xlabel('Company ID')
+    plt.ylabel('Average Accuracy (%)')
+    plt.ylim(0, 100)
+    plt.grid(True, axis='y')
+
+    # Bottom companies
+    plt.subplot(2, 1, 2)
+    plt.bar(bottom_companies['Company_ID'].astype(str), bottom_companies['Average_Accuracy'], color='red')
+    plt.title('Bottom 5 Companies by Model Accuracy')
+    plt.xlabel('Company ID')
+    plt.ylabel('Average Accuracy (%)')
+    plt.ylim(0, 100)
+    plt.axhline(y=70, color='r', linestyle='--', label='Target Accuracy (70%)')
+    plt.legend()
+    plt.grid(True, axis='y')
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close('all')
+
+
+def plot_accuracy_over_time(path, quarters, revenue_accuracies, expenditure_accuracies):
+    plt = _pyplot()
+    plt.figure(figsize=(12, 6))
+    plt.plot(quarters, revenue_accuracies, 'b-', marker='o', label='Revenue Accuracy')
+    plt.plot(quarters, expenditure_accuracies, 'r-', marker='o', label='Expenditure Accuracy')
+    plt.axhline(y=70, color='k', linestyle='--', label='Target Accuracy (70%)')
+    plt.title('Model Accuracy Over Time')
+    plt.xlabel('Quarter')
+    plt.ylabel('Accuracy (%)')
+    plt.xticks(rotation=45)
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close('all')
+
+
+def _render(job):
+    plot, kwargs = job
+    start = time.perf_counter()
+    plot(**kwargs)
+    return kwargs['path'], time.perf_counter() - start
+
+
+def render_figures(jobs, workers=None):
+    """Render (plot function, kwargs) jobs, in parallel worker processes when there's more than one
+
+    Every job gets plain data (arrays, small DataFrames) rather than models, so nothing
+    is recomputed and the payload sent to each worker stays small.
+    """
+    if not jobs:
+        return []
+
+    workers = workers or PLOT_WORKERS or os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+
+    if workers == 1:
+        return [_render(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_render, jobs))
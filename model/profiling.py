@@ -0,0 +1,102 @@
+import io
+import time
+import tracemalloc
+import warnings
+import joblib
+import numpy as np
+from sklearn.base import clone
+
+# Single-row predictions timed per model; the median is reported
+LATENCY_REPEATS = 50
+
+
+def _peak_allocation(function):
+    """Peak bytes allocated while running function"""
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def model_nbytes(obj, seen=None):
+    """Bytes held in the arrays a fitted model keeps, tree node arrays included
+
+    tracemalloc can't see tree nodes (sklearn allocates them outside Python's allocator),
+    so the in-memory size is counted from the model's state instead.
+    """
+    # Maps id to object: holding the object keeps short-lived __getstate__ dicts from
+    # being freed and their ids reused
+    seen = {} if seen is None else seen
+    if id(obj) in seen or obj is None or isinstance(obj, (str, bytes, int, float, bool, type)):
+        return 0
+    seen[id(obj)] = obj
+
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return obj.nbytes + sum(model_nbytes(item, seen) for item in obj.flat)
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(model_nbytes(value, seen) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(model_nbytes(item, seen) for item in obj)
+
+    # Estimators and sklearn's Cython Tree both expose their arrays through __getstate__
+    try:
+        state = obj.__getstate__()
+    except (AttributeError, TypeError):
+        return 0
+    return model_nbytes(state, seen) if isinstance(state, dict) else 0
+
+
+def profile_model(model, X_train, y_train, X_batch, search_seconds=None, refit=False, repeats=LATENCY_REPEATS):
+    """Measure what serving a fitted model costs
+
+    - Search_Seconds: search_seconds as given, the hyperparameter search that produced the
+      model (every CV fit included, so it depends on the search method)
+    - Fit_Seconds: with refit, one fit of the chosen configuration (no search); otherwise None
+    - Single_Row_ms: median latency of predicting one row
+    - Batch_ms / Batch_Rows: predicting X_batch in one call
+    - Predict_Peak_MB: peak memory allocated while predicting the batch
+    - Model_MB: memory the fitted model holds once loaded
+    - Artifact_MB: size of the joblib file
+    """
+    fit_seconds = None
+    if refit:
+        # The same fit already ran (and warned) during training
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            start = time.perf_counter()
+            clone(model).fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - start
+
+    row = X_batch.iloc[:1]
+    model.predict(row)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    model.predict(X_batch)
+    batch_seconds = time.perf_counter() - start
+
+    predict_peak = _peak_allocation(lambda: model.predict(X_batch))
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    artifact_bytes = buffer.tell()
+
+    return {
+        'Search_Seconds': search_seconds,
+        'Fit_Seconds': fit_seconds,
+        'Single_Row_ms': float(np.median(timings)) * 1000,
+        'Batch_ms': batch_seconds * 1000,
+        'Batch_Rows': len(X_batch),
+        'Predict_Peak_MB': predict_peak / 1e6,
+        'Model_MB': model_nbytes(model) / 1e6,
+        'Artifact_MB': artifact_bytes / 1e6
+    }
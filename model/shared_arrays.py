@@ -0,0 +1,43 @@
+import os
+import tempfile
+from contextlib import contextmanager
+import joblib
+import numpy as np
+
+# Arrays (and small values) attached in this process by attach_arrays
+_attached = {}
+
+
+@contextmanager
+def share_arrays(arrays):
+    """Dump named arrays once to a temporary directory for the life of the block
+
+    Yields the paths to pass to attach_arrays, e.g. as a process pool initializer, so
+    every worker memory-maps the same files instead of receiving a pickled copy per task.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for index, (name, array) in enumerate(arrays.items()):
+            paths[name] = os.path.join(directory, f'array_{index}.joblib')
+            joblib.dump(np.asarray(array), paths[name])
+        try:
+            yield paths
+        finally:
+            # Release this process's maps before the files go (required on Windows)
+            _attached.clear()
+
+
+def attach_arrays(paths, values=None):
+    """Memory-map shared arrays in this process, read-only, replacing any attached before
+
+    values (a dict) is stored alongside, for small per-run settings such as column names.
+    """
+    _attached.clear()
+    for name, path in paths.items():
+        _attached[name] = joblib.load(path, mmap_mode='r')
+    _attached.update(values or {})
+
+
+def attached_arrays():
+    """The arrays and values attached in this process, by name"""
+    return _attached
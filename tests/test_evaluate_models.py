@@ -0,0 +1,146 @@
+import contextlib
+import io
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model')
+sys.path.insert(0, MODEL_DIR)
+
+import evaluate_models  # noqa: E402
+
+MODES = [['--backtest', '--workers', '1'], ['--compare', '--workers', '1'], ['--stream'], ['--incremental']]
+
+
+def write_workspace(root, n_companies=30, n_quarters=8):
+    """A data/preprocessed_data.csv and trained model/ artifacts laid out like the repo"""
+    rng = np.random.default_rng(0)
+    quarters = [f'Q{quarter % 4 + 1} {2021 + quarter // 4}' for quarter in range(n_quarters)]
+    df = pd.DataFrame({
+        'Company_ID': np.repeat(np.arange(n_companies), n_quarters),
+        'Quarter': np.tile(quarters, n_companies)
+    })
+    for metric in ['Revenue', 'Expenditure', 'Gross_Profit', 'Total_Income']:
+        df[metric] = rng.uniform(1e6, 5e6, len(df))
+    for lag in range(1, 5):
+        for metric in ['Revenue', 'Expenditure', 'Gross_Profit', 'Total_Income']:
+            df[f'{metric}_Lag{lag}'] = df[metric] * rng.uniform(0.9, 1.1, len(df))
+
+    os.makedirs(os.path.join(root, 'data'))
+    os.makedirs(os.path.join(root, 'model', 'multi_output'))
+    df.to_csv(os.path.join(root, 'data', 'preprocessed_data.csv'), index=False)
+
+    features = [col for col in df.columns if 'Lag' in col]
+    for target in ['Revenue', 'Expenditure']:
+        model = LinearRegression().fit(df[features], df[target])
+        joblib.dump(model, os.path.join(root, 'model', f'{target.lower()}_model.joblib'))
+    joblib.dump(LinearRegression().fit(df[features], df[['Revenue', 'Expenditure']]),
+                os.path.join(root, 'model', 'multi_output', 'forecast_model_multi.joblib'))
+
+
+class EvaluateModelsMainTest(unittest.TestCase):
+    """main() runs every mode, with and without --multi-output, and rejects combined modes"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        write_workspace(self.root)
+        self.cwd = os.getcwd()
+        # The scripts use paths relative to the model directory
+        os.chdir(os.path.join(self.root, 'model'))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root)
+
+    def run_main(self, argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            evaluate_models.main(argv + ['--no-plots'])
+        return output.getvalue()
+
+    def read_results(self):
+        return {name: pd.read_csv(f'../model/{name}_evaluation_results.csv') for name in ['company', 'quarter']}
+
+    def assert_results_match(self, expected, actual):
+        for name in expected:
+            self.assertEqual(list(expected[name].columns), list(actual[name].columns))
+            self.assertTrue(expected[name].iloc[:, 0].equals(actual[name].iloc[:, 0]), name)
+            self.assertTrue(np.allclose(expected[name].iloc[:, 1:], actual[name].iloc[:, 1:], rtol=1e-12), name)
+
+    def test_each_mode_runs(self):
+        for mode in [[]] + MODES:
+            for multi_output in [[], ['--multi-output']]:
+                if mode and mode[0] == '--compare' and multi_output:
+                    continue
+                with self.subTest(argv=mode + multi_output):
+                    self.run_main(mode + multi_output)
+
+    def test_stream_and_incremental_match_one_pass(self):
+        self.run_main([])
+        expected = self.read_results()
+        self.assertEqual(len(expected['company']), 30)
+
+        # Small chunks, so companies and quarters are merged across chunks
+        for mode in [['--stream', '--chunk-rows', '17'], ['--incremental']]:
+            with self.subTest(argv=mode):
+                self.run_main(mode)
+                self.assert_results_match(expected, self.read_results())
+
+    def test_incremental_rerun_after_edit_matches_one_pass(self):
+        self.run_main(['--incremental'])
+
+        # Change one company's actual values; every other row must read back bit for bit
+        path = '../data/preprocessed_data.csv'
+        df = pd.read_csv(path, float_precision='round_trip')
+        df.loc[df['Company_ID'] == 7, 'Revenue'] *= 1.3
+        df.to_csv(path, index=False)
+
+        output = self.run_main(['--incremental'])
+        self.assertIn('Recomputed 8 of 240 company-quarters', output)
+        incremental = self.read_results()
+        self.run_main([])
+        self.assert_results_match(self.read_results(), incremental)
+
+    def test_incremental_keeps_only_current_models_statistics(self):
+        cache_dir = evaluate_models.EVAL_CACHE_DIR
+        os.makedirs(os.path.join(cache_dir, 'notes'))
+        stale = ['a' * 64 + '.joblib', 'b' * 64 + '.joblib.tmp']
+        unrelated = ['retrained.joblib', 'README.txt']
+        for name in stale + unrelated:
+            open(os.path.join(cache_dir, name), 'w').close()
+
+        self.run_main(['--incremental'])
+        current = f'{evaluate_models.model_fingerprint()}.joblib'
+        self.assertEqual(sorted(os.listdir(cache_dir)), sorted([current, 'notes'] + unrelated))
+
+    def test_incremental_cache_in_model_directory_keeps_artifacts(self):
+        artifacts = sorted(os.listdir('../model'))
+        with mock.patch.object(evaluate_models, 'EVAL_CACHE_DIR', '../model'):
+            self.run_main(['--incremental'])
+            self.run_main(['--incremental'])
+        self.assertTrue(set(artifacts) <= set(os.listdir('../model')))
+
+    def test_combined_modes_are_rejected(self):
+        for first, second in itertools.combinations(MODES, 2):
+            with self.subTest(argv=first + second):
+                with self.assertRaises(SystemExit) as raised:
+                    self.run_main(first + second)
+                self.assertEqual(raised.exception.code, 2)
+
+    def test_compare_rejects_multi_output(self):
+        with self.assertRaises(SystemExit) as raised:
+            self.run_main(['--compare', '--multi-output'])
+        self.assertEqual(raised.exception.code, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()